@@ -0,0 +1,62 @@
+"""Benchmark of time and peak memory of transpilation of large repeat counts,
+streamed to file and built to BrainFuck elements, compared to expanding the
+body of every repetition again (without memoized expansions).
+
+Run with `python benchmarks/bench_repeat.py`.
+"""
+
+import time
+import tracemalloc
+from typing import Callable
+
+from rainduck import code_elements
+from rainduck.transpiler import transpile_elements, transpile_to
+
+PROGRAMS = {
+    "ops": "1000000{+>}",
+    "loops": "100000{[-]>+<}",
+    "nested": "1000{1000{+>}<}",
+    "macro": "let m(x) = {x [-] -1x} in 200000{m({>+})}",
+}
+
+
+class Sink:
+    """File counting written characters."""
+
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.size += len(text)
+        return len(text)
+
+
+def measure(function: Callable[[], object]) -> tuple[float, int]:
+    code_elements.clear_memo()
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    print(f"{'program':>8} {'output':>9} {'stream (s)':>11} {'peak (KB)':>10}", end="")
+    print(f" {'elements (s)':>13} {'peak (KB)':>10} {'again (s)':>10}")
+    for name, code in PROGRAMS.items():
+        sink = Sink()
+        seconds, peak = measure(lambda: transpile_to(code, sink))  # type: ignore
+        elements_seconds, elements_peak = measure(lambda: transpile_elements(code))
+        memo_entry_size = code_elements.MEMO_ENTRY_SIZE
+        code_elements.MEMO_ENTRY_SIZE = 0
+        again_seconds, _ = measure(lambda: transpile_to(code, Sink()))  # type: ignore
+        code_elements.MEMO_ENTRY_SIZE = memo_entry_size
+        print(f"{name:>8} {sink.size:>9} {seconds:>11.3f} {peak // 1024:>10}", end="")
+        print(f" {elements_seconds:>13.3f} {elements_peak // 1024:>10}", end="")
+        print(f" {again_seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
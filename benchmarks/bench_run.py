@@ -0,0 +1,80 @@
+"""Benchmark of the built-in BrainFuck interpreter and compiled backend
+compared to a naive interpreter.
+
+Run with `python benchmarks/bench_run.py`.
+"""
+
+import io
+import time
+
+from rainduck import compiler, interpreter
+from rainduck.transpiler import transpile, transpile_elements
+
+PROGRAM = """
+let
+clear = {[-]}
+move(to) = {[- to + -1to]}
+copy(to; tmp) = {[- to + -1to tmp + -1tmp] tmp move(-1tmp) -1tmp}
+in
+40{+} [> 40{+} [> 40{+} [> 5{+} [>+<-] > copy(>; 2>) clear < < -] < -] < -] > .
+"""
+
+
+def naive(code: str) -> bytes:
+    jumps = {}
+    opened = []
+    for i, c in enumerate(code):
+        if c == "[":
+            opened.append(i)
+        elif c == "]":
+            j = opened.pop()
+            jumps[i], jumps[j] = j, i
+    tape = bytearray(30_000)
+    output = bytearray()
+    ptr = i = 0
+    while i < len(code):
+        c = code[i]
+        if c == "+":
+            tape[ptr] = (tape[ptr] + 1) & 255
+        elif c == "-":
+            tape[ptr] = (tape[ptr] - 1) & 255
+        elif c == ">":
+            ptr += 1
+        elif c == "<":
+            ptr -= 1
+        elif c == "[" and not tape[ptr]:
+            i = jumps[i]
+        elif c == "]" and tape[ptr]:
+            i = jumps[i]
+        elif c == ".":
+            output.append(tape[ptr])
+        i += 1
+    return bytes(output)
+
+
+def main() -> None:
+    code = transpile(PROGRAM)
+    start = time.perf_counter()
+    expected = naive(code)
+    naive_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    output = io.BytesIO()
+    interpreter.run(interpreter.Program([code]), io.BytesIO(), output)
+    seconds = time.perf_counter() - start
+    assert output.getvalue() == expected
+    start = time.perf_counter()
+    output = io.BytesIO()
+    program = compiler.compile_program(transpile_elements(PROGRAM))
+    compiler.run(program, io.BytesIO(), output)
+    compiled_seconds = time.perf_counter() - start
+    assert output.getvalue() == expected
+    print(f"naive interpreter:    {naive_seconds:.3f} s")
+    print(f"built-in interpreter: {seconds:.3f} s ({naive_seconds / seconds:.1f}x)")
+    print(
+        f"compiled to Python:   {compiled_seconds:.3f} s"
+        f" ({naive_seconds / compiled_seconds:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark of requests per second of the transpilation server compared to
+running rainduck command for every file.
+
+Run with `python benchmarks/bench_serve.py`.
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LIBRARY = "let clear = {[-]} move(to) = {[- to + -1to]} r = {>} in"
+PROGRAM = "let #import(lib.rd) in 10{+} move(3r) %d{r clear} 2{-}"
+REQUESTS = 2000
+COMMANDS = 20
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / "lib.rd").write_text(LIBRARY)
+        paths = []
+        for i in range(COMMANDS):
+            paths.append(Path(directory) / f"{i}.rd")
+            paths[-1].write_text(PROGRAM % (i % COMMANDS))
+        requests = "".join(
+            json.dumps(
+                {"id": i, "code": PROGRAM % (i % COMMANDS), "file_path": str(paths[0])}
+            )
+            + "\n"
+            for i in range(REQUESTS)
+        )
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-m", "rainduck.server"],
+            input=requests,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        server_seconds = time.perf_counter() - start
+        assert all(json.loads(r)["ok"] for r in result.stdout.splitlines())
+        start = time.perf_counter()
+        for path in paths:
+            subprocess.run(
+                [sys.executable, "-m", "rainduck.cli", str(path), "--no-cache"],
+                check=True,
+            )
+        command_seconds = time.perf_counter() - start
+    print(f"server:  {REQUESTS / server_seconds:8.1f} requests/s")
+    print(f"command: {COMMANDS / command_seconds:8.1f} files/s")
+
+
+if __name__ == "__main__":
+    main()
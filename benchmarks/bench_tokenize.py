@@ -0,0 +1,35 @@
+"""Benchmark of rainduck.tokens.tokenize showing linear scaling with code size.
+
+Run with `python benchmarks/bench_tokenize.py`.
+"""
+
+import time
+
+from rainduck.tokens import tokenize
+
+SAMPLE = """let
+clear = {[-]} // comment
+move_cell(from; to = <) = {from [- -1from to + -1to from] -1from}
+in
+move_cell({3 {clear >}}; -12<) 5{+>} #import(lib.rd)
+"""
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def bench(size: int) -> float:
+    code = (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+    start = time.perf_counter()
+    tokenize(code)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'size (B)':>12} {'time (s)':>10} {'us/KB':>8}")
+    for size in SIZES:
+        seconds = bench(size)
+        print(f"{size:>12} {seconds:>10.4f} {seconds / size * 1e9:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
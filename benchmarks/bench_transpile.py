@@ -0,0 +1,51 @@
+"""Benchmark of time and peak memory of transpilation to BrainFuck elements on
+expansion-heavy programs, compared to one BrainFuckOperation per character.
+
+Run with `python benchmarks/bench_transpile.py`.
+"""
+
+import time
+import tracemalloc
+from typing import Callable
+
+from rainduck.code_elements import BrainFuck, BrainFuckOperation
+from rainduck.transpiler import parse
+
+PROGRAMS = {
+    "runs": "let clear = {[-]} in 1000{100{+} 50{>} clear -50{>}}",
+    "macros": "let m(x) = {x 3{x>} -2x} in 100{m(200{+}) m({10{-<}})}",
+    "nested": "let f = {10{+>}} g = {10f} h = {10g} in 10h",
+    "deep": "let m0 = {+} "
+    + " ".join(f"m{i} = {{>m{i - 1}<}}" for i in range(1, 2000))
+    + " in 4m1999",
+}
+
+
+def measure(function: Callable[[], object]) -> tuple[float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def per_character(code: str) -> list[BrainFuck]:
+    return [BrainFuckOperation(c) for c in "".join(parse(code).emit())]
+
+
+def main() -> None:
+    print(f"{'program':>8} {'output':>9} {'nodes':>8} {'time (s)':>9}", end="")
+    print(f" {'peak (KB)':>10} {'naive (s)':>10} {'naive (KB)':>11}")
+    for name, code in PROGRAMS.items():
+        elements = parse(code).transpile()
+        output = sum(len(str(x)) for x in elements)
+        seconds, peak = measure(lambda: parse(code).transpile())
+        naive_seconds, naive_peak = measure(lambda: per_character(code))
+        print(f"{name:>8} {output:>9} {len(elements):>8} {seconds:>9.3f}", end="")
+        print(f" {peak // 1024:>10} {naive_seconds:>10.3f} {naive_peak // 1024:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Entry point of the rainduck command.
+
+Plain transpilation (`rainduck [transpile] SOURCE [--output OUTPUT]
+[--optimize N] [--cache-dir DIR] [--no-cache] [--stats] [--stats-format
+FORMAT] [--max-instructions N] [--max-depth N] [--timeout SECONDS]`) is done
+without importing typer and rich, which would take most of the start-up time. Everything else
+is handled by the typer application in rainduck.cli.
+"""
+
+import sys
+from pathlib import Path
+
+# commands of rainduck.cli other than transpile
+COMMANDS = {"build", "profile", "run", "serve", "size", "watch"}
+_OPTIONS = {
+    "--output": "output",
+    "--optimize": "optimize",
+    "-O": "optimize",
+    "--cache-dir": "cache_dir",
+    "--stats-format": "stats_format",
+    "--max-instructions": "max_instructions",
+    "--max-depth": "max_depth",
+    "--timeout": "timeout",
+}
+
+
+_FLAGS = ("--no-cache", "--stats")
+_INTEGERS = ("optimize", "max_instructions", "max_depth")
+
+
+def _parse(args: list[str]) -> dict[str, str] | None:
+    """Parse arguments of plain transpilation, None if they are anything else."""
+    if args and args[0] == "transpile":
+        args = args[1:]
+    elif args and args[0] in COMMANDS:
+        return None
+    parsed: dict[str, str] = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in _FLAGS:
+            parsed[arg[2:].replace("-", "_")] = arg
+        elif arg.startswith("-O") and len(arg) > 2:
+            parsed["optimize"] = arg[2:]
+        elif arg.startswith("-"):
+            name, equals, value = arg.partition("=")
+            if name not in _OPTIONS:
+                return None
+            if not equals:
+                i += 1
+                if i == len(args):
+                    return None
+                value = args[i]
+            parsed[_OPTIONS[name]] = value
+        elif "source" in parsed:
+            return None
+        else:
+            parsed["source"] = arg
+        i += 1
+    if "source" not in parsed:
+        return None
+    if not all(parsed.get(n, "0").isdigit() for n in _INTEGERS):
+        return None
+    try:
+        float(parsed.get("timeout", "0"))
+    except ValueError:
+        return None
+    if parsed.get("stats_format", "table") not in ("table", "json"):
+        return None
+    return parsed
+
+
+def main(args: list[str] | None = None) -> None:
+    args = sys.argv[1:] if args is None else args
+    parsed = _parse(args)
+    if parsed is None:
+        from rainduck.cli import app
+
+        app(args, prog_name="rainduck")
+        return
+    from rainduck import build, cache
+    from rainduck.code_elements import command_limits
+    from rainduck.errors import RainDuckError
+    from rainduck.stats import Stats
+
+    cache_dir = parsed.get("cache_dir")
+    cache.configure(
+        None if cache_dir is None else Path(cache_dir), "no_cache" in parsed
+    )
+    stats = Stats() if "stats" in parsed else None
+    instructions, depth = parsed.get("max_instructions"), parsed.get("max_depth")
+    timeout = parsed.get("timeout")
+    limits = command_limits(
+        None if instructions is None else int(instructions),
+        None if depth is None else int(depth),
+        None if timeout is None else float(timeout),
+    )
+    try:
+        build.transpile_source(
+            parsed["source"],
+            parsed.get("output"),
+            int(parsed.get("optimize", "0")),
+            stats,
+            limits,
+        )
+    except RainDuckError as e:
+        from rich.console import Console
+
+        Console(stderr=True).print(e.colored())
+        sys.exit(1)
+    if not (stats is None):
+        sys.stderr.write(stats.report(parsed.get("stats_format", "table")))
+
+
+if __name__ == "__main__":
+    main()
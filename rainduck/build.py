@@ -0,0 +1,245 @@
+"""Transpilation of many files at once, in parallel processes."""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from rainduck import cache
+from rainduck.code_elements import Limits, recorded_imports
+from rainduck.errors import RainDuckError
+from rainduck.stats import Stats
+from rainduck.transpiler import transpile_to
+
+
+def output_path(source: str) -> str:
+    """Default path of BrainFuck code transpiled from source."""
+    if source.endswith(".rd"):
+        return source[:-2] + "bf"
+    return source + ".bf"
+
+
+def sources(patterns: Iterable[str]) -> list[str]:
+    """
+    Return RainDuck files given by patterns, which are files, directories
+    (searched recursively for .rd files) or glob patterns.
+    """
+    import glob
+
+    result: dict[str, None] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = sorted(str(p) for p in Path(pattern).rglob("*.rd"))
+        elif os.path.isfile(pattern):
+            paths = [pattern]
+        else:
+            paths = sorted(glob.glob(pattern, recursive=True))
+        result.update(dict.fromkeys(p for p in paths if os.path.isfile(p)))
+    return list(result)
+
+
+def transpile_file(
+    source: str,
+    output: str,
+    optimize: int = 0,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> None:
+    """
+    Transpile source file to output file. Output is written to temporary file
+    first, so existing output is kept on error. Phases are recorded to stats,
+    transpilation is aborted when it exceeds limits.
+    """
+    with open(source) as f:
+        code = f.read()
+    tmp_output = output + ".tmp"
+    try:
+        with open(tmp_output, "w") as f:
+            transpile_to(code, f, Path(source), optimize, stats=stats, limits=limits)
+    except BaseException:
+        os.remove(tmp_output)
+        raise
+    os.replace(tmp_output, output)
+
+
+class Manifest:
+    """
+    Record of inputs (source and transitively imported files with their
+    content hashes) of every output, stored as JSON file. Outputs whose
+    inputs did not change are not transpiled again.
+    """
+
+    path: Path
+    outputs: dict[str, dict[str, Any]]
+    _hashes: dict[str, str | None]
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.outputs = {}
+        self._hashes = {}
+        try:
+            with path.open() as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == cache.version():
+            self.outputs = data.get("outputs", {})
+
+    def _hash(self, path: str) -> str | None:
+        if path not in self._hashes:
+            self._hashes[path] = cache.file_hash(Path(path))
+        return self._hashes[path]
+
+    def up_to_date(self, source: str, optimize: int) -> bool:
+        """Whether output of source was transpiled from current inputs."""
+        output = os.path.abspath(output_path(source))
+        entry = self.outputs.get(output)
+        return (
+            entry is not None
+            and entry["source"] == os.path.abspath(source)
+            and entry["optimize"] == optimize
+            and os.path.isfile(output)
+            and all(self._hash(p) == h for p, h in entry["inputs"].items())
+        )
+
+    def record(self, source: str, optimize: int, inputs: dict[str, str] | None) -> None:
+        """Record inputs of transpiled source, or forget it if it failed."""
+        output = os.path.abspath(output_path(source))
+        if inputs is None:
+            self.outputs.pop(output, None)
+        else:
+            entry = {"source": os.path.abspath(source), "optimize": optimize}
+            self.outputs[output] = entry | {"inputs": inputs}
+
+    def save(self) -> None:
+        data = {"version": cache.version(), "outputs": self.outputs}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def transpile_recorded(
+    source: str, optimize: int = 0, limits: Limits | None = None
+) -> tuple[str | None, dict[Path, tuple[int, int]]]:
+    """
+    Transpile source to default output. Return error message (None if it was
+    transpiled) and files source imported, with their modification times and
+    sizes.
+    """
+    try:
+        with recorded_imports() as imported:
+            transpile_file(source, output_path(source), optimize, limits=limits)
+    except RainDuckError as e:
+        return e.colored(), imported
+    except (OSError, UnicodeDecodeError) as e:
+        return f"[bold red]{type(e).__name__}[/bold red]: {e}", imported
+    return None, imported
+
+
+def transpile_source(
+    source: str,
+    output: str | None = None,
+    optimize: int = 0,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> None:
+    """
+    Transpile source file to output file (next to source by default), or to
+    standard output if output is '-'. Phases are recorded to stats,
+    transpilation is aborted when it exceeds limits.
+    """
+    if output == "-":
+        with open(source) as f:
+            code = f.read()
+        transpile_to(
+            code, sys.stdout, Path(source), optimize, stats=stats, limits=limits
+        )
+    else:
+        output = output_path(source) if output is None else output
+        transpile_file(source, output, optimize, stats, limits)
+
+
+def _build_file(
+    source: str, optimize: int, limits: Limits | None = None
+) -> tuple[str | None, dict[str, str]]:
+    """
+    Transpile source to default output. Return error message on failure and
+    content hashes of source and all imported files.
+    """
+    error, imported = transpile_recorded(source, optimize, limits)
+    if not (error is None):
+        return error, {}
+    inputs = {}
+    for path in [Path(source).resolve(), *imported]:
+        if (content_hash := cache.file_hash(path)) is None:
+            return f"Can't read {path}.", {}
+        inputs[str(path)] = content_hash
+    return None, inputs
+
+
+def build(
+    files: list[str],
+    optimize: int = 0,
+    jobs: int | None = None,
+    cache_dir: Path | None = None,
+    manifest: Manifest | None = None,
+    force: bool = False,
+    limits: Limits | None = None,
+) -> Iterator[tuple[str, str | None]]:
+    """
+    Transpile files in jobs processes (number of CPUs by default) and yield
+    each file with error message, or None if it was transpiled. Every process
+    keeps its own cache of parsed imports. If manifest is given, files whose
+    inputs did not change are skipped (not yielded) unless force is true, and
+    the manifest is updated. Files exceeding limits fail.
+    """
+    if not (manifest is None or force):
+        files = [f for f in files if not manifest.up_to_date(f, optimize)]
+    results: Iterable[tuple[str | None, dict[str, str]]]
+    if jobs == 1 or len(files) <= 1:
+        cache.set_directory(cache_dir)
+        results = (_build_file(source, optimize, limits) for source in files)
+        yield from _record(files, results, optimize, manifest)
+        return
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, min(64, len(files) // (4 * jobs)))
+    # forking while other threads (e.g. of server) run may deadlock workers
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    with ProcessPoolExecutor(
+        jobs,
+        mp_context=context,
+        initializer=cache.set_directory,
+        initargs=(cache_dir,),
+    ) as executor:
+        results = executor.map(
+            _build_file,
+            files,
+            [optimize] * len(files),
+            [limits] * len(files),
+            chunksize=chunksize,
+        )
+        yield from _record(files, results, optimize, manifest)
+
+
+def _record(
+    files: list[str],
+    results: Iterable[tuple[str | None, dict[str, str]]],
+    optimize: int,
+    manifest: Manifest | None,
+) -> Iterator[tuple[str, str | None]]:
+    try:
+        for source, (error, inputs) in zip(files, results):
+            if not (manifest is None):
+                manifest.record(source, optimize, None if error else inputs)
+            yield source, error
+    finally:
+        if not (manifest is None):
+            manifest.save()
@@ -0,0 +1,120 @@
+"""Persistent cache of parsed imported files.
+
+Entries are stored in cache directory (disabled by default) as pickled macros
+keyed by file path, file content, rainduck version and hash of its sources. Every entry also
+records content hashes of all transitively imported files and is used only
+when none of them changed.
+"""
+
+import functools
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from rainduck.code_elements import Macro
+
+directory: Path | None = None
+
+
+def default_directory() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "rainduck"
+
+
+def set_directory(path: Path | None) -> None:
+    """Set cache directory, None disables the cache."""
+    global directory
+    directory = path
+
+
+def configure(path: Path | None = None, disable: bool = False) -> None:
+    """Set cache directory as command line options say, default if no path."""
+    set_directory(None if disable else path or default_directory())
+
+
+@functools.cache
+def version() -> str:
+    """
+    Version of rainduck ('dev' when it is not installed) with hash of its
+    sources, which change also in editable installs.
+    """
+    import importlib.metadata  # slow to import, needed only with cache
+
+    try:
+        installed = importlib.metadata.version("rainduck")
+    except importlib.metadata.PackageNotFoundError:
+        installed = "dev"
+    sources = hashlib.sha256()
+    for source in sorted(Path(__file__).parent.glob("*.py")):
+        sources.update(source.read_bytes())
+    return f"{installed}-{sources.hexdigest()}"
+
+
+def content_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def file_hash(path: Path) -> str | None:
+    try:
+        return content_hash(path.read_text())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _entry(path: Path, code: str) -> Path | None:
+    if directory is None:
+        return None
+    key = hashlib.sha256(f"{version()}\0{path}\0".encode())
+    key.update(code.encode())
+    return directory / f"{key.hexdigest()}.pickle"
+
+
+def load(path: Path, code: str) -> "tuple[dict[Path, str], dict[str, Macro]] | None":
+    """
+    Return hashes of imported files and macros of file with given path and
+    code if they are cached and imported files did not change.
+    """
+    entry = _entry(path, code)
+    if entry is None:
+        return None
+    import pickle
+
+    try:
+        with entry.open("rb") as f:
+            deps, macros = pickle.load(f)
+    except Exception:  # missing or broken entry
+        return None
+    if any(file_hash(p) != h for p, h in deps.items()):
+        return None
+    return deps, macros
+
+
+def store(path: Path, code: str, deps: list[Path], macros: "dict[str, Macro]") -> None:
+    """Store macros of file with given code, which imports deps, to cache."""
+    entry = _entry(path, code)
+    if entry is None:
+        return
+    import pickle
+
+    dep_hashes = {p: file_hash(p) for p in deps if p != path}
+    dep_hashes[path] = content_hash(code)
+    try:
+        data = pickle.dumps((dep_hashes, macros), pickle.HIGHEST_PROTOCOL)
+    except RecursionError:  # too deeply nested code, parse it every time
+        return
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, entry)
+    except OSError:
+        pass
+
+
+def clear() -> None:
+    """Remove all entries from cache directory."""
+    if directory is not None and directory.is_dir():
+        for entry in directory.glob("*.pickle"):
+            entry.unlink(missing_ok=True)
@@ -1,35 +1,403 @@
+import functools
 import sys
+from enum import Enum
 from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Any, BinaryIO
 
 import typer
-from rich.console import Console
+from typer.core import TyperGroup
 
+from rainduck import build, cache
+from rainduck.code_elements import MAX_DEPTH, Limits, command_limits
 from rainduck.errors import RainDuckError
-from rainduck.transpiler import transpile
+from rainduck.interpreter import EOF
+from rainduck.stats import Stats
+from rainduck.transpiler import transpile_to
 
-app = typer.Typer()
-err_console = Console(stderr=True)
+if TYPE_CHECKING:
+    from rich.console import Console
+
+
+class _DefaultCommandGroup(TyperGroup):
+    """Group of commands running 'transpile' when no command name is given."""
+
+    def parse_args(self, ctx: Any, args: list[str]) -> list[str]:
+        # ctx is click.Context, which typer may vendor under a private name
+        group_options = {opt for param in self.get_params(ctx) for opt in param.opts}
+        if args and args[0] not in self.commands and args[0] not in group_options:
+            args = ["transpile", *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(cls=_DefaultCommandGroup)
+
+
+@functools.cache
+def err_console() -> "Console":
+    """Console for errors, rich is imported only when something is printed."""
+    from rich.console import Console
+
+    return Console(stderr=True)
+
+
+class StatsFormat(str, Enum):
+    TABLE = "table"
+    JSON = "json"
+
+
+class Backend(str, Enum):
+    INTERPRETER = "interpreter"
+    PYTHON = "python"
+
+
+Optimize = Annotated[
+    int, typer.Option("--optimize", "-O", help="Optimization level (0-2).")
+]
+
+CacheDir = Annotated[
+    Path | None,
+    typer.Option(
+        help="Directory for cache of parsed imports"
+        " [default: $XDG_CACHE_HOME/rainduck]."
+    ),
+]
+NoCache = Annotated[
+    bool, typer.Option("--no-cache", help="Do not cache parsed imports.")
+]
+MaxInstructions = Annotated[
+    int | None,
+    typer.Option(help="Abort transpilation emitting more instructions."),
+]
+MaxDepth = Annotated[
+    int | None,
+    typer.Option(
+        help="Abort transpilation nesting expansions deeper, 0 for no limit "
+        f"[default: macro calls nested at most {MAX_DEPTH} deep]."
+    ),
+]
+Timeout = Annotated[
+    float | None,
+    typer.Option(help="Abort transpilation taking more seconds."),
+]
+
+
+def _read(source: str) -> str:
+    with open(source) as f:
+        return f.read()
+
+
+@app.command("transpile")
+def main(
+    source: str,
+    output: str | None = None,
+    optimize: Optimize = 0,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help="Print time, size and peak memory of phases to standard error.",
+        ),
+    ] = False,
+    stats_format: StatsFormat = StatsFormat.TABLE,
+    source_map: Annotated[
+        Path | None,
+        typer.Option(help="File for map of BrainFuck code to RainDuck source."),
+    ] = None,
+    max_instructions: MaxInstructions = None,
+    max_depth: MaxDepth = None,
+    timeout: Timeout = None,
+) -> None:
+    """Transpile RainDuck code to BrainFuck (default command)."""
+    if not (source_map is None) and optimize:
+        raise typer.BadParameter("Source maps are made only for unoptimized code.")
+    cache.configure(cache_dir, no_cache)
+    recorded = Stats() if stats else None
+    limits = command_limits(max_instructions, max_depth, timeout)
+    try:
+        if source_map is None:
+            build.transpile_source(source, output, optimize, recorded, limits)
+        else:
+            _transpile_mapped(source, output, source_map, recorded, limits)
+    except RainDuckError as e:
+        err_console().print(e.colored())
+        sys.exit(1)
+    if not (recorded is None):
+        sys.stderr.write(recorded.report(stats_format.value))
+
+
+def _transpile_mapped(
+    source: str,
+    output: str | None,
+    source_map: Path,
+    stats: Stats | None,
+    limits: Limits | None,
+) -> None:
+    from rainduck import sourcemap
+
+    code, mapped = sourcemap.transpile(_read(source), Path(source), limits, stats)
+    if not (stats is None):
+        stats.start("write")
+    if output == "-":
+        sys.stdout.write(code)
+    else:
+        Path(build.output_path(source) if output is None else output).write_text(code)
+    with source_map.open("w") as f:
+        mapped.dump(f)
+    if not (stats is None):
+        stats.count("write", len(code))
+        stats.start(None)
+
+
+@app.command("build")
+def build_files(
+    paths: Annotated[
+        list[str], typer.Argument(help="Files, directories or glob patterns.")
+    ],
+    optimize: Optimize = 0,
+    jobs: Annotated[
+        int | None,
+        typer.Option("--jobs", "-j", help="Number of processes [default: CPUs]."),
+    ] = None,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+    manifest: Annotated[
+        Path, typer.Option(help="File recording inputs of transpiled files.")
+    ] = Path(".rainduck-build.json"),
+    force: Annotated[
+        bool, typer.Option("--force", help="Transpile even unchanged files.")
+    ] = False,
+    max_instructions: MaxInstructions = None,
+    max_depth: MaxDepth = None,
+    timeout: Timeout = None,
+) -> None:
+    """
+    Transpile many RainDuck files (next to them) in parallel, skipping files
+    which did not change (nor files they import) since the last build.
+    """
+    cache.configure(cache_dir, no_cache)
+    files = build.sources(paths)
+    transpiled = failed = 0
+    for source, error in build.build(
+        files,
+        optimize,
+        jobs,
+        cache.directory,
+        build.Manifest(manifest),
+        force,
+        command_limits(max_instructions, max_depth, timeout),
+    ):
+        transpiled += 1
+        if not (error is None):
+            failed += 1
+            err_console().print(f"[bold]{source}[/bold]", highlight=False)
+            err_console().print(error)
+    err_console().print(
+        f"Transpiled {transpiled - failed} of {len(files)} files"
+        f" ({len(files) - transpiled} up to date)."
+    )
+    if failed:
+        sys.exit(1)
+
+
+@app.command("watch")
+def watch_files(
+    paths: Annotated[
+        list[str], typer.Argument(help="Files, directories or glob patterns.")
+    ],
+    optimize: Optimize = 0,
+    interval: Annotated[
+        float, typer.Option(help="Seconds between checks for changes.")
+    ] = 0.2,
+) -> None:
+    """
+    Transpile RainDuck files and transpile them again whenever they or files
+    they import change.
+    """
+
+    def report(source: str, error: str | None, seconds: float) -> None:
+        if error is None:
+            err_console().print(
+                f"[green]Transpiled[/green] {source} ({seconds * 1000:.1f} ms)",
+                highlight=False,
+            )
+        else:
+            err_console().print(f"[bold]{source}[/bold]", highlight=False)
+            err_console().print(error)
+
+    from rainduck import watch
+
+    try:
+        watch.watch(watch.Watcher(paths, optimize), report, interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def serve(
+    socket: Annotated[
+        str | None,
+        typer.Option(help="Unix socket to listen on instead of standard input."),
+    ] = None,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+    max_instructions: MaxInstructions = None,
+    max_depth: MaxDepth = None,
+    timeout: Timeout = None,
+) -> None:
+    """
+    Answer JSON transpilation requests, one per line, keeping parsed imports
+    in memory. See rainduck.server for the format.
+    """
+    from rainduck import server
+
+    cache.configure(cache_dir, no_cache)
+    server.limits = command_limits(max_instructions, max_depth, timeout)
+    try:
+        if socket is None:
+            server.serve_stream(sys.stdin, sys.stdout)
+        else:
+            server.serve_socket(socket)
+    except KeyboardInterrupt:
+        pass
 
 
 @app.command()
-def main(source: str, output: str | None = None) -> None:
-    source_path = Path(source)
-    with source_path.open() as f:
-        rainduck = f.read()
+def profile(
+    source: str,
+    collapsed: Annotated[
+        Path | None,
+        typer.Option(help="File for stacks of macros in flamegraph format."),
+    ] = None,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+) -> None:
+    """
+    Transpile RainDuck code (discarding the result) and print calls, emitted
+    instructions and expansion time of every macro.
+    """
+    from rainduck.profiler import Profiler
+    from rainduck.transpiler import transpile_chunks
+
+    cache.configure(cache_dir, no_cache)
+    rainduck = _read(source)
     try:
-        brainfuck = transpile(rainduck, source_path)
+        with Profiler(Path(source).name) as profiler:
+            for _ in transpile_chunks(rainduck, Path(source)):
+                pass
     except RainDuckError as e:
-        err_console.print(e.colored())
+        err_console().print(e.colored())
         sys.exit(1)
-    if output is None:
-        if source.endswith(".rd"):
-            out_filename = source[:-2] + "bf"
+    sys.stdout.write(profiler.report())
+    if not (collapsed is None):
+        collapsed.write_text(profiler.collapsed())
+
+
+@app.command()
+def size(
+    source: str,
+    inverse: Annotated[
+        bool,
+        typer.Option("--inverse", help="Measure inverse of the code (-1{...})."),
+    ] = False,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+    max_depth: MaxDepth = None,
+    timeout: Timeout = None,
+) -> None:
+    """
+    Print length of transpiled (unoptimized) BrainFuck code without emitting
+    it, or error it would fail with.
+    """
+    from rainduck.transpiler import size as code_size
+
+    cache.configure(cache_dir, no_cache)
+    try:
+        length = code_size(
+            _read(source),
+            Path(source),
+            inverse,
+            command_limits(None, max_depth, timeout),
+        )
+    except RainDuckError as e:
+        err_console().print(e.colored())
+        sys.exit(1)
+    sys.stdout.write(f"{length}\n")
+
+
+@app.command()
+def run(
+    source: str,
+    optimize: Optimize = 0,
+    tape_size: int = 30_000,
+    cell_bits: Annotated[
+        int, typer.Option(help="Cell width in bits (8, 16, 32 or 64).")
+    ] = 8,
+    eof: Annotated[
+        EOF, typer.Option(help="Value stored by ',' at end of input.")
+    ] = EOF.ZERO,
+    backend: Annotated[
+        Backend, typer.Option(help="Run interpreted or compiled to Python.")
+    ] = Backend.INTERPRETER,
+    cache_dir: CacheDir = None,
+    no_cache: NoCache = False,
+    hotspots: Annotated[
+        bool,
+        typer.Option(
+            "--hotspots",
+            help="Print the most executed source lines and macros to standard"
+            " error (interpreter only).",
+        ),
+    ] = False,
+) -> None:
+    """Transpile RainDuck code and run it with built-in interpreter or compiled."""
+    if cell_bits not in (8, 16, 32, 64):
+        raise typer.BadParameter("Cell width must be 8, 16, 32 or 64 bits.")
+    if hotspots and (optimize or backend == Backend.PYTHON):
+        raise typer.BadParameter("Hot spots are counted only by interpreter.")
+    from rainduck import compiler, interpreter
+    from rainduck.transpiler import transpile_chunks, transpile_elements
+
+    cache.configure(cache_dir, no_cache)
+    rainduck = _read(source)
+    try:
+        streams = (sys.stdin.buffer, sys.stdout.buffer)
+        if hotspots:
+            _run_counted(rainduck, Path(source), streams, tape_size, cell_bits, eof)
+        elif backend == Backend.PYTHON:
+            compiled = compiler.compile_program(
+                transpile_elements(rainduck, Path(source), optimize)
+            )
+            compiler.run(compiled, *streams, tape_size, cell_bits, eof)
         else:
-            out_filename = source + ".bf"
-    else:
-        out_filename = output
-    with open(out_filename, "w") as f:
-        f.write(brainfuck)
+            program = interpreter.Program(
+                transpile_chunks(rainduck, Path(source), optimize)
+            )
+            interpreter.run(program, *streams, tape_size, cell_bits, eof)
+    except RainDuckError as e:
+        err_console().print(e.colored())
+        sys.exit(1)
+
+
+def _run_counted(
+    code: str,
+    file_path: Path,
+    streams: tuple[BinaryIO, BinaryIO],
+    tape_size: int,
+    cell_bits: int,
+    eof: EOF,
+) -> None:
+    """Run code and print its hot spots, also when it is interrupted."""
+    from rainduck import interpreter, sourcemap
+
+    transpiled, mapped = sourcemap.transpile(code, file_path)
+    program = interpreter.Program([transpiled], counted=True)
+    try:
+        interpreter.run(program, *streams, tape_size, cell_bits, eof)
+    finally:
+        spots = sourcemap.hotspots(mapped, program.executions())
+        sys.stderr.write(sourcemap.report(*spots))
 
 
 if __name__ == "__main__":
@@ -1,17 +1,35 @@
+import re
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Any, Self, Sequence, cast
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    Iterator,
+    Self,
+    Sequence,
+    TypeVar,
+    cast,
+)
 
+from rainduck import cache
 from rainduck.errors import (
     RainDuckArgumentError,
     RainDuckError,
     RainDuckImportError,
     RainDuckInversionError,
+    RainDuckLimitError,
     RainDuckNameError,
+    RainDuckRecursionError,
     RainDuckSyntaxError,
 )
-from rainduck.tokens import Char, Number, Special, Token, Word
+from rainduck.tokens import Char, Number, Special, Token, TokenArray, Word
 
 
 class _CodeElementMeta(ABCMeta):
@@ -29,28 +47,139 @@ class _CodeElementMeta(ABCMeta):
             else:
                 code_elements.append(cls)
 
+    def take_at(
+        cls,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        parent: "CodeBlock | None" = None,
+        file_path: Path | None = None,
+    ) -> "tuple[CodeElement, int] | None":
+        """
+        Take code element beginning on index pos of tokens (not reaching end)
+        and return it together with index after its end.
+        """
+        taken = cls.take_steps(tokens, pos, end, parent, file_path)
+        if taken is None or isinstance(taken, tuple):
+            return taken
+        return _run(taken)
+
+    def take_steps(
+        cls,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        parent: "CodeBlock | None" = None,
+        file_path: Path | None = None,
+    ) -> "tuple[CodeElement, int] | Steps[tuple[CodeElement, int]] | None":
+        """
+        Take code element like take_at, or return generator taking it if it
+        has nested elements. Nested elements are taken by yielding generators
+        of their steps, which are sent back the results, so nesting is not
+        limited by recursion limit. Subclasses override one of take_at and
+        take_steps.
+        """
+        return cls.take_at(tokens, pos, end, parent, file_path)
+
     def take(
         cls,
         code: list[Token],
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
     ) -> "CodeElement | None":
-        pass
+        """Take code element from beginning of list of tokens and remove them."""
+        taken = cls.take_at(TokenArray(code), 0, len(code), parent, file_path)
+        if taken is None:
+            return None
+        elem, pos = taken
+        del code[:pos]
+        return elem
 
 
 code_elements: list[_CodeElementMeta] = []
 
+T = TypeVar("T")
+Steps = Generator[Any, Any, T]  # parsing steps, see _CodeElementMeta.take_steps
+
+CHUNK_SIZE = 1 << 16  # preferred maximal length of emitted chunks of code
+_INVERSE = {"+": "-", "-": "+", "<": ">", ">": "<", ",": ",", ".": "."}
+_RUNS = re.compile(r"\++|-+|<+|>+|,+|\.+|\[|\]")
+MEMO_SIZE = 1 << 22  # maximal total length of memoized macro expansions
+MEMO_ENTRY_SIZE = 1 << 16  # longer expansions are not memoized
+MEMO_ENTRIES = 1 << 10  # maximal number of memoized macro expansions
+MEMO_ENTRY_COST = 1 << 8  # length charged for tree and frame kept by entry
+MAX_DEPTH = 1 << 16  # default limit of depth of nested macro calls
+
 
 class CodeElement(metaclass=_CodeElementMeta):
 
+    __slots__ = ()
     assign_to_list = False
 
+    def emit(
+        self,
+        inverse: bool = False,
+        env: "Frame | None" = None,
+        limits: "Limits | None" = None,
+    ) -> Iterator[str]:
+        """
+        Yield transpiled BrainFuck code in chunks. env is frame of the
+        innermost body of macro with arguments the element is in. If limits
+        are given, RainDuckLimitError is raised when expansion exceeds them.
+        """
+        return _expand(self, inverse, env, limits)
+
     @abstractmethod
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
+    def steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "Generator[str | Expansion, str | None, None]":
+        """
+        Yield chunks of code and expansions of nested elements to be emitted
+        in their place. Errors of nested elements are thrown in at the yield,
+        code of memoized expansion is sent back if it fits in memo.
+        """
         pass
 
+    def size_steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "SizeSteps":
+        """
+        Like steps, but sizes of code may be yielded instead of the code.
+        Sizes of nested expansions are sent back, steps ignore them.
+        """
+        return cast("SizeSteps", self.steps(inverse, env))
+
+    def size(
+        self,
+        inverse: bool = False,
+        env: "Frame | None" = None,
+        limits: "Limits | None" = None,
+    ) -> int:
+        """
+        Length of transpiled BrainFuck code, computed without emitting it.
+        Errors (like inversion errors) are raised as if it was emitted, limits
+        of depth and time apply.
+        """
+        budget = _Budget(Limits() if limits is None else limits)
+        return _measure(self, inverse, env, budget)
+
+    def transpile(
+        self, inverse: bool = False, limits: "Limits | None" = None
+    ) -> list["BrainFuck"]:
+        return brainfuck_elements(self.emit(inverse, limits=limits))
+
+    def children(self) -> Iterable["CodeElement"]:
+        """Code elements directly nested in this one."""
+        return ()
+
 
 class BrainFuck(CodeElement):
+    """
+    Transpiled BrainFuck code. Runs of the same operation are kept as one
+    BrainFuckOperation with count, so the code takes little memory.
+    """
+
+    __slots__ = ()
     assign_to_list = False
 
     @abstractmethod
@@ -60,40 +189,54 @@ class BrainFuck(CodeElement):
 
 class BrainFuckOperation(BrainFuck):
 
+    __slots__ = ("code", "count")
     code: str
+    count: int
 
-    def __init__(self, code: str) -> None:
+    def __init__(self, code: str, count: int = 1) -> None:
         self.code = code
+        self.count = count
 
     @classmethod
-    def take(
+    def take_at(
         cls,
-        code: list[Token],
+        tokens: TokenArray,
+        pos: int,
+        end: int,
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
-    ) -> Self | None:
-        fst = code[0]
-        match fst:
+    ) -> tuple[Self, int] | None:
+        match tokens.tokens[pos]:
             case Char(c) if c in "<>+-,.":
-                del code[0]
-                return cls(c)
+                return cls(c), pos + 1
         return None
 
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
-        return [
-            BrainFuckOperation(
-                {"+": "-", "-": "+", "<": ">", ">": "<"}.get(self.code, self.code)
-                if inverse
-                else self.code
-            )
-        ]
+    def emit(
+        self,
+        inverse: bool = False,
+        env: "Frame | None" = None,
+        limits: "Limits | None" = None,
+    ) -> Iterator[str]:
+        if limits is None:
+            return self.steps(inverse, env)
+        return super().emit(inverse, env, limits)
+
+    def steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "Generator[str, str | None, None]":
+        code = _INVERSE[self.code] if inverse else self.code
+        if self.count == 1:
+            yield code
+        else:
+            yield from _repeat(code, self.count)
 
     def __str__(self) -> str:
-        return self.code
+        return self.code * self.count
 
 
 class BrainFuckLoop(BrainFuck):
 
+    __slots__ = ("code", "line_pos", "char_pos")
     code: Sequence[CodeElement]
     line_pos: int | None
     char_pos: int | None
@@ -106,49 +249,58 @@ class BrainFuckLoop(BrainFuck):
         self.char_pos = char_pos
 
     @classmethod
-    def take(
+    def take_steps(
         cls,
-        tokens: list[Token],
+        tokens: TokenArray,
+        pos: int,
+        end: int,
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
-    ) -> Self | None:
-        match tokens[0]:
+    ) -> tuple[Self, int] | Steps[tuple[Self, int]] | None:
+        match tokens.tokens[pos]:
             case Char("[", line_pos, char_pos):
-                del tokens[0]
-                brackets = 0
-                code: list[Token] = []
-                while tokens:
-                    match tokens.pop(0), brackets:
-                        case Char("[") as t, _:
-                            brackets += 1
-                            code.append(t)
-                        case Char("]"), 0:
-                            break
-                        case Char("]") as t, _:
-                            brackets -= 1
-                            code.append(t)
-                        case t, _:
-                            code.append(t)
-                else:
+                close = tokens.closing(pos, end)
+                if close is None:
                     raise RainDuckSyntaxError("Missing ']'", line_pos, char_pos)
-                return cls(parse_list(code, parent, file_path), line_pos, char_pos)
+                return cls._take_code(
+                    tokens, pos + 1, close, parent, file_path, line_pos, char_pos
+                )
         return None
 
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
+    @classmethod
+    def _take_code(
+        cls,
+        tokens: TokenArray,
+        pos: int,
+        close: int,
+        parent: "CodeBlock | None",
+        file_path: Path | None,
+        line_pos: int | None,
+        char_pos: int | None,
+    ) -> Steps[tuple[Self, int]]:
+        code = yield _parse_range(tokens, pos, close, parent, file_path)
+        return cls(code, line_pos, char_pos), close + 1
+
+    def children(self) -> Iterable[CodeElement]:
+        return self.code
+
+    def steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "Generator[str | Expansion, str | None, None]":
         if inverse:
             raise RainDuckInversionError(
                 "Loop can't be inverted", self.line_pos, self.char_pos
             )
-        return [
-            BrainFuckLoop(
-                sum([x.transpile() for x in self.code], []),
-                self.line_pos,
-                self.char_pos,
-            )
-        ]
+        yield "["
+        for x in self.code:
+            if type(x) is BrainFuckOperation and x.count == 1:
+                yield x.code
+            else:
+                yield x, False, env, _PLAIN
+        yield "]"
 
     def __str__(self) -> str:
-        return "[" + "".join(str(x) for x in self.code) + "]"
+        return "".join(self.emit())
 
 
 class Multiplication(CodeElement):
@@ -167,29 +319,139 @@ class Multiplication(CodeElement):
         self.char_pos = char_pos
 
     @classmethod
-    def take(
+    def take_steps(
         cls,
-        code: list[Token],
+        tokens: TokenArray,
+        pos: int,
+        end: int,
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
-    ) -> "CodeElement | None":
-        match code[0]:
+    ) -> tuple[Self, int] | Steps[tuple[Self, int]] | None:
+        match tokens.tokens[pos]:
             case Number(n, line_pos, char_pos):
-                del code[0]
-                return cls(n, _take_elem(code, parent, file_path), line_pos, char_pos)
+                return cls._take_code(
+                    n, tokens, pos + 1, end, parent, file_path, line_pos, char_pos
+                )
         return None
 
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
+    @classmethod
+    def _take_code(
+        cls,
+        num: int,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        parent: "CodeBlock | None",
+        file_path: Path | None,
+        line_pos: int | None,
+        char_pos: int | None,
+    ) -> Steps[tuple[Self, int]]:
+        taken = _take_elem(tokens, pos, end, parent, file_path)
+        code, pos = taken if isinstance(taken, tuple) else (yield taken)
+        return cls(num, code, line_pos, char_pos), pos
+
+    def children(self) -> Iterable[CodeElement]:
+        return (self.code,)
+
+    def steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "Generator[str | Expansion, str | None, None]":
         inv = (self.num >= 0) == inverse
         num = abs(self.num)
-        if inverse:
-            try:
-                return num * self.code.transpile(inv)
-            except RainDuckInversionError as e:
+        try:
+            if num == 0:  # code is not emitted, but still must be valid
+                yield self.code, inv, env, _DISCARDED
+            elif isinstance(op := _operation(self.code), BrainFuckOperation):
+                yield from _repeat("".join(op.emit(inv)), num)
+            elif num == 1:
+                yield self.code, inv, env, _PLAIN
+            else:  # emit code once and repeat it if it is not too long
+                code = yield self.code, inv, env, _MEMOIZED
+                if code is None:
+                    for _ in range(num - 1):
+                        yield self.code, inv, env, _PLAIN
+                elif not (_tracer is None):  # tracer is notified of reused code
+                    for _ in range(num - 1):
+                        yield self.code, inv, env, _MEMOIZED
+                elif code:
+                    yield from _repeat(code, num - 1)
+        except RainDuckInversionError as e:
+            if inverse:
                 e.add_pointer(self.line_pos, self.char_pos)
-                raise e
-        else:
-            return num * self.code.transpile(inv)
+            raise e
+        except RainDuckLimitError as e:
+            e.add_pointer(self.line_pos, self.char_pos)
+            raise e
+
+    def size_steps(
+        self, inverse: bool = False, env: "Frame | None" = None
+    ) -> "SizeSteps":
+        inv = (self.num >= 0) == inverse
+        num = abs(self.num)
+        try:
+            if num == 0:
+                yield self.code, inv, env, _DISCARDED
+            elif num == 1:
+                yield self.code, inv, env, _PLAIN
+            else:  # code is measured once, its size is repeated
+                size = yield self.code, inv, env, _MEMOIZED
+                yield (num - 1) * cast(int, size)
+        except RainDuckInversionError as e:
+            if inverse:
+                e.add_pointer(self.line_pos, self.char_pos)
+            raise e
+        except RainDuckLimitError as e:
+            e.add_pointer(self.line_pos, self.char_pos)
+            raise e
+
+
+class Frame:
+    """
+    Immutable binding of arguments to body of macro. Each argument is code
+    element with frame it is emitted in, parent is frame of macro definition.
+    Frames are equal when they bind the same elements.
+    """
+
+    __slots__ = ("parent", "arguments", "_hash")
+
+    parent: "Frame | None"
+    arguments: tuple[tuple[CodeElement, "Frame | None"], ...]
+    _hash: int
+
+    def __init__(
+        self,
+        parent: "Frame | None",
+        arguments: tuple[tuple[CodeElement, "Frame | None"], ...],
+    ) -> None:
+        object.__setattr__(self, "parent", parent)
+        object.__setattr__(self, "arguments", arguments)
+        object.__setattr__(self, "_hash", hash((parent, arguments)))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("Frame is immutable.")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        pairs: list[tuple[Frame | None, object]] = [(self, other)]
+        while pairs:  # compare with explicit stack, frames may be deeply nested
+            a, b = pairs.pop()
+            if a is b:
+                continue
+            if not (
+                isinstance(a, Frame)
+                and isinstance(b, Frame)
+                and a._hash == b._hash
+                and len(a.arguments) == len(b.arguments)
+            ):
+                return False
+            for (x, x_env), (y, y_env) in zip(a.arguments, b.arguments):
+                if x is not y:
+                    return False
+                pairs.append((x_env, y_env))
+            pairs.append((a.parent, b.parent))
+        return True
 
 
 class Macro:
@@ -206,42 +468,47 @@ class Macro:
         self.args = args
         self.code = code
 
-    def __call__(self, *args: CodeElement, **kwds: CodeElement) -> CodeElement:
+    def bind(
+        self,
+        args: Sequence[CodeElement],
+        kwds: dict[str, CodeElement],
+        env: Frame | None,
+        def_env: Frame | None,
+    ) -> Frame | None:
+        """
+        Return frame for body of macro called from env with given arguments.
+        def_env is frame the macro was defined in, it is used for default
+        arguments and returned when the macro takes no arguments.
+        """
         if len(self.args) < len(args):
             raise RainDuckArgumentError(
                 f"Too many arguments for macro {self.name} (max {len(self.args)} expected, {len(args)} given)"
             )
-        code = self.code
-        if args or self.args:
-            if not self.args and isinstance(self.code, CodeBlock):
-                raise RainDuckArgumentError(f"Macro '{self.name}' takes no arguments.")
-            arguments = {}
-            for name, value in zip(self.args, args):
-                arguments[name] = value
-            for name, value in kwds.items():
-                if name not in self.args:
-                    raise RainDuckArgumentError(
-                        f"Macro '{self.name}' got an unexpected keyword argument: '{name}'"
-                    )
-                arguments[name] = value
-            for name, value2 in self.args.items():
-                if name not in arguments:
-                    if value2 is None:
-                        raise RainDuckArgumentError(f"Argument {name} not given.")
-                    arguments[name] = value2
-            macros = {}
-            for name, value in arguments.items():
-                macros[name] = Macro(name, OrderedDict(), value)
-            code = cast(CodeBlock, code).add_macros(macros)
-        return code
+        if not self.args:
+            return def_env
+        arguments: dict[str, tuple[CodeElement, Frame | None]] = {}
+        for name, value in zip(self.args, args):
+            arguments[name] = (value, env)
+        for name, value in kwds.items():
+            if name not in self.args:
+                raise RainDuckArgumentError(
+                    f"Macro '{self.name}' got an unexpected keyword argument: '{name}'"
+                )
+            arguments[name] = (value, env)
+        for name, value2 in self.args.items():
+            if name not in arguments:
+                if value2 is None:
+                    raise RainDuckArgumentError(f"Argument {name} not given.")
+                arguments[name] = (value2, def_env)
+        return Frame(def_env, tuple(arguments[name] for name in self.args))
 
 
 class CodeBlock(CodeElement):
 
     macros: dict[str, Macro]
-    my_macros: dict[str, Macro]
     parent: "CodeBlock | None"
     code: list[CodeElement]
+    arguments: tuple[str, ...] = ()  # argument names if body of macro
 
     def __init__(
         self,
@@ -251,24 +518,50 @@ class CodeBlock(CodeElement):
         file_path: Path | None = None,
     ) -> None:
         self.macros = {}
-        self.my_macros = self.macros
-        while macro_defs:
-            match macro_defs.pop(0):
+        self.parent = parent
+        self.code = []
+        if macro_defs:
+            self.define_macros(TokenArray(macro_defs), 0, len(macro_defs), file_path)
+        if tokens:
+            self.code = parse_range(TokenArray(tokens), 0, len(tokens), self, file_path)
+
+    def define_macros(
+        self,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        file_path: Path | None = None,
+    ) -> None:
+        """Define macros from tokens between pos and end (let-in block)."""
+        _run(self._define_macros(tokens, pos, end, file_path))
+
+    def _define_macros(
+        self,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        file_path: Path | None = None,
+    ) -> Steps[None]:
+        macro_defs = tokens.tokens
+        while pos < end:
+            pos += 1
+            match macro_defs[pos - 1]:
                 case Word(name, line_pos, char_pos):
-                    if not macro_defs:
+                    if pos >= end:
                         raise RainDuckSyntaxError(
                             "Expected macro definition.", line_pos, char_pos
                         )
                     args: OrderedDict[str, CodeElement | None] = OrderedDict()
-                    match macro_defs[0]:
+                    match macro_defs[pos]:
                         case Char("(", bracket_line_pos, bracket_char_pos):  # Take args
-                            del macro_defs[0]
-                            while macro_defs:
-                                token = macro_defs.pop(0)
+                            pos += 1
+                            while pos < end:
+                                token = macro_defs[pos]
+                                pos += 1
                                 match token:
                                     case Char(")"):
                                         break
-                                if not macro_defs:
+                                if pos >= end:
                                     raise RainDuckSyntaxError(
                                         "Macro arguments definition not finished.",
                                         bracket_line_pos,
@@ -276,30 +569,36 @@ class CodeBlock(CodeElement):
                                     )
                                 match token:
                                     case Word(arg_name):
-                                        match macro_defs.pop(0):
+                                        pos += 1
+                                        match macro_defs[pos - 1]:
                                             case Char(";" | ")" as c):
                                                 args[arg_name] = None
                                                 if c == ")":
                                                     break
                                             case Char("=", cp, lp):
-                                                if not macro_defs:
+                                                if pos >= end:
                                                     raise RainDuckSyntaxError(
                                                         "Expected default argument value.",
                                                         cp,
                                                         lp,
                                                     )
-                                                args[arg_name] = _take_elem(
-                                                    macro_defs, self, file_path
+                                                taken = _take_elem(
+                                                    tokens, pos, end, self, file_path
+                                                )
+                                                args[arg_name], pos = (
+                                                    taken
+                                                    if isinstance(taken, tuple)
+                                                    else (yield taken)
                                                 )
-                                                if not macro_defs:
+                                                if pos >= end:
                                                     raise RainDuckSyntaxError(
                                                         "Macro arguments definition not finished.",
                                                         bracket_line_pos,
                                                         bracket_char_pos,
                                                     )
-                                                match macro_defs[0]:
+                                                match macro_defs[pos]:
                                                     case Char(";"):
-                                                        del macro_defs[0]
+                                                        pos += 1
                                                     case Char(")"):
                                                         pass
                                                     case t:
@@ -308,54 +607,71 @@ class CodeBlock(CodeElement):
                                                             t.line_pos,
                                                             t.char_pos,
                                                         )
-                    if len(macro_defs) < 2:
+                    if end - pos < 2:
                         raise RainDuckSyntaxError(
                             "Expected macro definition.", line_pos, char_pos
                         )
-                    match macro_defs.pop(0):
+                    pos += 1
+                    match macro_defs[pos - 1]:
                         case Char("="):
-                            block = CodeBlock.take(macro_defs, self, file_path)
-                            if block is None:
-                                t2: Token = macro_defs[0]
+                            block_taken = CodeBlock.take_steps(
+                                tokens, pos, end, self, file_path
+                            )
+                            if block_taken is None:
+                                t2: Token = macro_defs[pos]
                                 raise RainDuckSyntaxError(
                                     "Code block expected.", t2.line_pos, t2.char_pos
                                 )
+                            block, pos = (
+                                block_taken
+                                if isinstance(block_taken, tuple)
+                                else (yield block_taken)
+                            )
+                            block.arguments = tuple(args)
                             self.macros[name] = Macro(name, args, block)
                 case Special("import", import_path, lp, cp):
                     if file_path is None:
                         raise RainDuckImportError(
                             "Imports not supported here: no file path.", lp, cp
                         )
-                    imported_macros = _import(file_path, import_path)
+                    imported_macros = _import(file_path, import_path, lp, cp)
                     self.macros.update(imported_macros)
-        self.parent = parent
-        self.code = parse_list(tokens, self, file_path)
 
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
-        return sum(
-            [elem.transpile(inverse) for elem in self.code[:: -1 if inverse else 1]], []
-        )
+    def steps(
+        self, inverse: bool = False, env: Frame | None = None
+    ) -> "Generator[str | Expansion, str | None, None]":
+        for elem in reversed(self.code) if inverse else self.code:
+            if type(elem) is BrainFuckOperation and elem.count == 1:
+                yield _INVERSE[elem.code] if inverse else elem.code
+            else:
+                yield elem, inverse, env, _PLAIN
 
     @classmethod
-    def take(
+    def take_steps(
         cls,
-        code: list[Token],
+        tokens: TokenArray,
+        pos: int,
+        end: int,
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
-    ) -> Self | None:
-        match code[0]:
-            case Char("{", char_pos, line_pos):
-                del code[0]
-                macro_defs: list[Token] = []
-                match code[0]:
+    ) -> tuple[Self, int] | Steps[tuple[Self, int]] | None:
+        code = tokens.tokens
+        match code[pos]:
+            case Char("{", line_pos, char_pos):
+                block_end = tokens.closing(pos, end)
+                pos += 1
+                let_start = let_end = pos
+                match code[pos] if pos < end else None:
                     case Word("let", let_line_pos, let_char_pos):
-                        del code[0]
-                        brackets = 0
-                        while code:
-                            match code.pop(0), brackets:
-                                case Word("in"), 0:
+                        pos += 1
+                        let_start = pos
+                        while pos < end:
+                            match code[pos]:
+                                case Word("in"):
+                                    let_end = pos
+                                    pos += 1
                                     break
-                                case Char("}", end_line_pos, end_char_pos), 0:
+                                case Char("}", end_line_pos, end_char_pos):
                                     e = RainDuckSyntaxError(
                                         "End of group before end of let-in block.",
                                         end_line_pos,
@@ -363,44 +679,50 @@ class CodeBlock(CodeElement):
                                     )
                                     e.add_pointer(let_line_pos, let_char_pos)
                                     raise e
-                                case Char("{") as t, _:
-                                    brackets += 1
-                                    macro_defs.append(t)
-                                case Char("}") as t, _:
-                                    brackets -= 1
-                                    macro_defs.append(t)
-                                case t, _:
-                                    macro_defs.append(t)
+                                case Char("{"):
+                                    close = tokens.closing(pos, end)
+                                    pos = end if close is None else close + 1
+                                case _:
+                                    pos += 1
                         else:
                             raise RainDuckSyntaxError(
                                 "End of file before end of let-lin block",
                                 let_char_pos,
                                 let_line_pos,
                             )
-                tokens: list[Token] = []
-                brackets = 0
-                while code:
-                    match code.pop(0), brackets:
-                        case Char("}", end_line_pos, end_char_pos), 0:
-                            break
-                        case Char("{") as t, _:
-                            brackets += 1
-                            tokens.append(t)
-                        case Char("}") as t, _:
-                            brackets -= 1
-                            tokens.append(t)
-                        case t, _:
-                            tokens.append(t)
-                else:
+                if block_end is None:
                     raise RainDuckSyntaxError(
-                        "End of file before end of let-lin block", char_pos, line_pos
+                        "End of file before end of let-lin block", line_pos, char_pos
                     )
-                return cls(tokens, macro_defs, parent, file_path)
+                block = cls(parent=parent)
+                return block._take_code(
+                    tokens, let_start, let_end, pos, block_end, file_path
+                )
         return None
 
-    def add_macros(self, macros: dict[str, Macro]) -> Self:
-        self.macros = self.my_macros | macros  # TODO: This should not be possible.
-        return self
+    def _take_code(
+        self,
+        tokens: TokenArray,
+        let_start: int,
+        let_end: int,
+        pos: int,
+        end: int,
+        file_path: Path | None,
+    ) -> Steps[tuple[Self, int]]:
+        """Define macros of let-in block and take code until end."""
+        if let_start < let_end:
+            yield self._define_macros(tokens, let_start, let_end, file_path)
+        self.code = yield _parse_range(tokens, pos, end, self, file_path)
+        return self, end + 1
+
+    def children(self) -> Iterable[CodeElement]:
+        """Code of the block and bodies and default arguments of macros defined
+        (not imported) in it."""
+        for macro in self.macros.values():
+            if cast(CodeBlock, macro.code).parent is self:
+                yield macro.code
+                yield from (v for v in macro.args.values() if not (v is None))
+        yield from self.code
 
 
 class MacroCall(CodeElement):
@@ -411,6 +733,9 @@ class MacroCall(CodeElement):
     parent: CodeBlock | None
     line_pos: int | None
     char_pos: int | None
+    target: "Macro | CodeBlock | None" = None  # macro or block with argument
+    hops: int = 0  # number of frames between the call and the target
+    index: int = 0  # index of argument in frame
 
     def __init__(
         self,
@@ -429,83 +754,666 @@ class MacroCall(CodeElement):
         self.char_pos = char_pos
 
     @classmethod
-    def take(
+    def take_steps(
         cls,
-        code: list[Token],
+        tokens: TokenArray,
+        pos: int,
+        end: int,
         parent: "CodeBlock | None" = None,
         file_path: Path | None = None,
-    ) -> "CodeElement | None":
-        match code[0]:
+    ) -> tuple[Self, int] | Steps[tuple[Self, int]] | None:
+        code = tokens.tokens
+        match code[pos]:
             case Word(name, line_pos, char_pos):
-                del code[0]
-                args = []
-                kwds = {}
-                if code:
-                    match code[0]:
-                        case Char("(", bracket_line_pos, bracket_char_pos):  # )
-                            del code[0]
-                            keywords = False
-                            while code:
-                                if len(code) < 2:
-                                    raise RainDuckSyntaxError(
-                                        "Arguments not finished, missing ')'",
-                                        bracket_line_pos,
-                                        bracket_char_pos,
-                                    )
-                                match code[0], code[1], keywords:
-                                    case Word(argname), Char("=", lp, cp), _:
-                                        del code[0]
-                                        del code[0]
-                                        if not code:
-                                            raise RainDuckSyntaxError(
-                                                "Expected argument value.", lp, cp
-                                            )
-                                        kwds[argname] = _take_elem(
-                                            code, parent, file_path
-                                        )
-                                        keywords = True
-                                    case _, _, False:
-                                        args.append(_take_elem(code, parent, file_path))
-                                    case t, _, True:
-                                        raise RainDuckArgumentError(
-                                            "Positional argument follows keyword argument.",
-                                            t.line_pos,
-                                            t.char_pos,
-                                        )
-                                if not code:
-                                    raise RainDuckSyntaxError(
-                                        "Arguments not finished, missing ')'",
-                                        bracket_line_pos,
-                                        bracket_char_pos,
-                                    )
-                                match code.pop(0):
-                                    case Char(";"):
-                                        pass
-                                    case Char(")"):
-                                        break
-                                    case _:
-                                        raise RainDuckSyntaxError(
-                                            "Expected ';' or ')'."
-                                        )
-                return cls(name, args, kwds, parent, line_pos, char_pos)
+                match code[pos + 1] if pos + 1 < end else None:
+                    case Char("("):  # )
+                        return cls._take_arguments(
+                            name, tokens, pos + 1, end, parent, file_path
+                        )
+                return cls(name, [], {}, parent, line_pos, char_pos), pos + 1
         return None
 
-    def transpile(self, inverse: bool = False) -> list["BrainFuck"]:
+    @classmethod
+    def _take_arguments(
+        cls,
+        name: str,
+        tokens: TokenArray,
+        pos: int,
+        end: int,
+        parent: "CodeBlock | None",
+        file_path: Path | None,
+    ) -> Steps[tuple[Self, int]]:
+        """Take call with arguments in brackets beginning on index pos."""
+        code = tokens.tokens
+        line_pos, char_pos = code[pos - 1].line_pos, code[pos - 1].char_pos
+        bracket_line_pos, bracket_char_pos = code[pos].line_pos, code[pos].char_pos
+        pos += 1
+        args = []
+        kwds = {}
+        keywords = False
+        while pos < end:
+            if end - pos < 2:
+                raise RainDuckSyntaxError(
+                    "Arguments not finished, missing ')'",
+                    bracket_line_pos,
+                    bracket_char_pos,
+                )
+            match code[pos], code[pos + 1], keywords:
+                case Word(argname), Char("=", lp, cp), _:
+                    pos += 2
+                    if pos >= end:
+                        raise RainDuckSyntaxError("Expected argument value.", lp, cp)
+                    taken = _take_elem(tokens, pos, end, parent, file_path)
+                    kwds[argname], pos = (
+                        taken if isinstance(taken, tuple) else (yield taken)
+                    )
+                    keywords = True
+                case _, _, False:
+                    taken = _take_elem(tokens, pos, end, parent, file_path)
+                    arg, pos = taken if isinstance(taken, tuple) else (yield taken)
+                    args.append(arg)
+                case t, _, True:
+                    raise RainDuckArgumentError(
+                        "Positional argument follows keyword argument.",
+                        t.line_pos,
+                        t.char_pos,
+                    )
+            if pos >= end:
+                raise RainDuckSyntaxError(
+                    "Arguments not finished, missing ')'",
+                    bracket_line_pos,
+                    bracket_char_pos,
+                )
+            pos += 1
+            match code[pos - 1]:
+                case Char(";"):
+                    pass
+                case Char(")"):
+                    break
+                case _:
+                    raise RainDuckSyntaxError("Expected ';' or ')'.")
+        return cls(name, args, kwds, parent, line_pos, char_pos), pos
+
+    def children(self) -> Iterable[CodeElement]:
+        yield from self.args
+        yield from self.kwds.values()
+
+    def resolve(self) -> None:
+        """
+        Bind the call to macro it calls, or to body of macro with argument of
+        that name. hops is number of bodies of macros with arguments between
+        the call and the target.
+        """
+        self.hops = 0
         block = self.parent
         while not (block is None):
+            if self.name in block.arguments:
+                self.target = block
+                self.index = block.arguments.index(self.name)
+                return
             if self.name in block.macros:
-                try:
-                    return block.macros[self.name](*self.args, **self.kwds).transpile(
-                        inverse
-                    )
-                except RainDuckError as e:
-                    e.add_pointer(self.line_pos, self.char_pos, self.name)
-                    raise e
+                self.target = block.macros[self.name]
+                return
+            if block.arguments:
+                self.hops += 1
             block = block.parent
         raise RainDuckNameError(
             f"'{self.name}' is not defined.", self.line_pos, self.char_pos
         )
 
+    def steps(
+        self, inverse: bool = False, env: Frame | None = None
+    ) -> "Generator[str | Expansion, str | None, None]":
+        if self.target is None:  # transpiled code must not modify parsed tree
+            raise RainDuckNameError(
+                f"'{self.name}' is not resolved, call resolve on parsed code.",
+                self.line_pos,
+                self.char_pos,
+            )
+        frame = env
+        for _ in range(self.hops):
+            frame = cast(Frame, frame).parent
+        try:
+            if isinstance(self.target, Macro):
+                frame = self.target.bind(self.args, self.kwds, env, frame)
+                yield self.target.code, inverse, frame, _MEMOIZED
+            else:
+                if self.args:
+                    raise RainDuckArgumentError(
+                        f"Too many arguments for macro {self.name} (max 0 expected, {len(self.args)} given)"
+                    )
+                elem, elem_env = cast(Frame, frame).arguments[self.index]
+                if type(elem) is BrainFuckOperation and elem.count == 1:
+                    yield _INVERSE[elem.code] if inverse else elem.code
+                else:
+                    yield elem, inverse, elem_env, _PLAIN
+        except RainDuckError as e:
+            e.add_pointer(self.line_pos, self.char_pos, self.name)
+            raise e
+
+
+# code of expansions with depth and macro depth of expansions nested in them
+_memo: OrderedDict[tuple[CodeElement, Frame | None, bool], tuple[str, int, int]] = (
+    OrderedDict()
+)
+_memo_size = 0
+_memo_lock = threading.Lock()
+
+
+class Tracer:
+    """
+    Object notified of expansions while it is active (used as context
+    manager). Depth is depth of stack of expansions, key is memo key of
+    memoized expansion. If memo is not reused, every expansion is done again.
+    """
+
+    reuses_memo = True
+    _outer: "Tracer | None" = None
+
+    def __enter__(self) -> Self:
+        global _tracer
+        self._outer, _tracer = _tracer, self
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        global _tracer
+        _tracer = self._outer
+
+    def count(self, instructions: int) -> None:
+        """Code of given length was emitted."""
+
+    def push(self, elem: CodeElement, depth: int, key: Any = None) -> None:
+        """Expansion of elem was started, key is given if it is memoized."""
+
+    def memoized(self, key: Any) -> None:
+        """Memoized expansion on top of the stack was stored with key."""
+
+    def pop(self, depth: int) -> None:
+        """Expansion at depth was finished."""
+
+    def reuse(self, key: Any, instructions: int) -> None:
+        """Memoized expansion with key and given length was reused."""
+
+
+_tracer: Tracer | None = None
+
+
+@dataclass(frozen=True)
+class Limits:
+    """
+    Limits of expansion of code, None means no limit. Macro depth is limited
+    by default, so macros calling themselves with ever growing arguments don't
+    exhaust memory.
+    """
+
+    instructions: int | None = None  # emitted (unoptimized) instructions
+    depth: int | None = None  # depth of nested expansions
+    seconds: float | None = None  # wall time of expansion
+    # depth of nested macro calls and repetitions (memoized expansions)
+    macro_depth: int | None = MAX_DEPTH
+
+
+def command_limits(
+    max_instructions: int | None, max_depth: int | None, timeout: float | None
+) -> Limits | None:
+    """
+    Limits given by command line options, None if no limit is given. Maximal
+    depth limits also macro depth, 0 means no limit of depth.
+    """
+    if max_instructions is None and max_depth is None and timeout is None:
+        return None
+    if max_depth is None:
+        return Limits(max_instructions, None, timeout)
+    depth = max_depth or None
+    return Limits(max_instructions, depth, timeout, depth)
+
+
+class _Budget:
+    """Instructions, depth and time spent by expansion, checked against limits."""
+
+    limits: Limits
+    emitted: int
+    deadline: float | None
+    _ticks: int
+
+    def __init__(self, limits: Limits) -> None:
+        self.limits = limits
+        self.emitted = 0
+        self.deadline = None
+        if not (limits.seconds is None):
+            self.deadline = time.perf_counter() + limits.seconds
+        self._ticks = 0
+
+    def exceeded(
+        self, instructions: int, depth: int, macro_depth: int = 0
+    ) -> RainDuckLimitError | None:
+        """
+        Record instructions about to be emitted at depth (and macro depth) and
+        return error if some limit is exceeded. Time is checked once in 256
+        calls.
+        """
+        limits = self.limits
+        self.emitted += instructions
+        if not (limits.instructions is None) and self.emitted > limits.instructions:
+            return RainDuckLimitError(
+                f"Code is longer than {limits.instructions} instructions."
+            )
+        if not (limits.depth is None) and depth > limits.depth:
+            return RainDuckLimitError(
+                f"Expansions are nested deeper than {limits.depth}."
+            )
+        if not (limits.macro_depth is None) and macro_depth > limits.macro_depth:
+            return RainDuckLimitError(
+                f"Macro calls are nested deeper than {limits.macro_depth}."
+            )
+        self._ticks += 1
+        if (
+            not (self.deadline is None)
+            and not self._ticks & 255
+            and time.perf_counter() > self.deadline
+        ):
+            return RainDuckLimitError(
+                f"Transpilation took longer than {limits.seconds} seconds."
+            )
+        return None
+
+
+_PLAIN, _DISCARDED, _MEMOIZED = range(3)  # kinds of expansions
+Expansion = tuple[CodeElement, bool, Frame | None, int]  # element, inverse, env, kind
+SizeSteps = Generator["str | int | Expansion", "int | None", None]
+
+
+def _expand(
+    elem: CodeElement, inverse: bool, env: Frame | None, limits: Limits | None = None
+) -> Iterator[str]:
+    """
+    Emit code of element, running steps of nested elements with explicit
+    stack, so nesting is not limited by recursion limit. Discarded expansions
+    are only measured, code of memoized ones is reused for equal element,
+    frame and inverse and sent back to steps which yielded them.
+    Expansions are reported to tracer if it is active. Exceeded limit is
+    thrown in steps which yielded the code or expansion exceeding it (also
+    reused one, whose depth is memoized with its code), expansion containing
+    itself raises RainDuckRecursionError. Macro depth is number of memoized
+    expansions on stack.
+    """
+    global _memo_size
+    tracer = _tracer
+    budget = _Budget(Limits() if limits is None else limits)
+    exceeded: RainDuckLimitError | None = None
+    memoize = tracer is None or tracer.reuses_memo
+    top = elem.steps(inverse, env)
+    # steps and key of memoized expansion (None if it is not memoized)
+    stack: list[tuple[Generator[str | Expansion, str | None, None], Any]] = [
+        (top, None)
+    ]
+    active: set[tuple[CodeElement, Frame | None, bool]] = set()  # keys on stack
+    # depth and macro depth reached by expansions on stack
+    reached: list[tuple[int, int]] = [(1, 0)]
+    depth = 1
+    error: BaseException | None = None
+    sent: str | None = None  # code of memoized expansion to send to top steps
+    # memoized expansions being emitted: depth, key, index of first chunk and
+    # number of characters before it, code of them is recorded to transcript
+    records: list[tuple[int, tuple[CodeElement, Frame | None, bool], int, int]] = []
+    transcript: list[str] = []
+    offset = 0  # index of first chunk in transcript
+    recorded = 0  # number of characters recorded
+    while depth:
+        step: str | Expansion | None
+        try:
+            if not (sent is None):
+                value, sent = sent, None
+                steps: Iterator[str | Expansion] = chain((top.send(value),), top)
+            elif error is None:
+                steps = top
+            else:
+                thrown, error = error, None
+                steps = chain((top.throw(thrown),), top)
+            for step in steps:
+                if not isinstance(step, str):
+                    break
+                exceeded = budget.exceeded(len(step), depth)
+                if not (exceeded is None):
+                    step = None
+                    break
+                yield step
+                if not (tracer is None):
+                    tracer.count(len(step))
+                if records:
+                    transcript.append(step)
+                    recorded += len(step)
+                    if recorded - records[0][3] > MEMO_ENTRY_SIZE:
+                        offset = _forget_long(records, transcript, offset, recorded)
+            else:
+                step = None
+        except StopIteration:
+            step = None
+        except Exception as e:
+            error, step = e, None
+        if not (exceeded is None):
+            error, exceeded = exceeded, None
+            continue
+        if not (step is None):
+            nested, nested_inverse, nested_env, kind = step
+            key = None
+            if kind == _MEMOIZED:
+                key = (nested, nested_env, nested_inverse)
+                if key in active:
+                    error = RainDuckRecursionError("Expansion contains itself.")
+                    continue
+            error = budget.exceeded(0, depth + 1, len(active) + (kind == _MEMOIZED))
+            if not (error is None):
+                continue
+            if kind == _DISCARDED:  # code is not emitted, but still must be valid
+                try:
+                    _measure(
+                        nested,
+                        nested_inverse,
+                        nested_env,
+                        budget,
+                        depth + 1,
+                        len(active),
+                    )
+                except Exception as e:
+                    error = e
+                continue
+            elif memoize and not (key is None):
+                with _memo_lock:
+                    entry = _memo.get(key)
+                    if not (entry is None):
+                        _memo.move_to_end(key)
+                if not (entry is None):
+                    code, height, macro_height = entry
+                    reach = (depth + height, len(active) + macro_height)
+                    error = budget.exceeded(len(code), *reach)
+                    if not (error is None):
+                        continue
+                    reached[-1] = max(reached[-1][0], reach[0]), max(
+                        reached[-1][1], reach[1]
+                    )
+                    sent = code
+                    yield code
+                    if not (tracer is None):
+                        tracer.reuse(key, len(code))
+                    if records:
+                        transcript.append(code)
+                        recorded += len(code)
+                        if recorded - records[0][3] > MEMO_ENTRY_SIZE:
+                            offset = _forget_long(records, transcript, offset, recorded)
+                    continue
+                start = offset + len(transcript)
+                records.append((depth + 1, key, start, recorded))
+            if not (tracer is None):
+                memoized = kind == _MEMOIZED and memoize
+                tracer.push(nested, depth + 1, key if memoized else None)
+            top = nested.steps(nested_inverse, nested_env)
+            stack.append((top, key))
+            if not (key is None):
+                active.add(key)
+            reached.append((depth + 1, len(active)))
+            depth += 1
+            continue
+        # steps on top of stack are finished
+        deepest, macro_deepest = reached.pop()
+        if records and records[-1][0] == depth:
+            _, key, start, start_recorded = records.pop()
+            if error is None:
+                code = "".join(transcript[start - offset :])
+                transcript[start - offset :] = [code]  # outer ones join less
+                sent = code
+                with _memo_lock:
+                    if key not in _memo:
+                        height = deepest - depth + 1
+                        macro_height = macro_deepest - len(active) + 1
+                        _memo[key] = code, height, macro_height
+                        _memo_size += len(code) + MEMO_ENTRY_COST
+                        while _memo_size > MEMO_SIZE or len(_memo) > MEMO_ENTRIES:
+                            evicted = _memo.popitem(last=False)[1][0]
+                            _memo_size -= len(evicted) + MEMO_ENTRY_COST
+                if not (tracer is None):
+                    tracer.memoized(key)
+            if not records:
+                transcript.clear()
+                offset = recorded = 0
+        if not (tracer is None):
+            tracer.pop(depth)
+        _, key = stack.pop()
+        if not (key is None):
+            active.discard(key)
+        depth -= 1
+        if depth:
+            top = stack[-1][0]
+            reached[-1] = max(reached[-1][0], deepest), max(
+                reached[-1][1], macro_deepest
+            )
+    if not (error is None):
+        raise error
+
+
+def _forget_long(
+    records: list[tuple[int, Any, int, int]],
+    transcript: list[str],
+    offset: int,
+    recorded: int,
+) -> int:
+    """
+    Stop recording expansions longer than MEMO_ENTRY_SIZE, forget chunks no
+    longer recorded and return new offset of transcript.
+    """
+    while records and recorded - records[0][3] > MEMO_ENTRY_SIZE:
+        del records[0]
+    start = records[0][2] if records else offset + len(transcript)
+    del transcript[: start - offset]
+    return start
+
+
+def _measure(
+    elem: CodeElement,
+    inverse: bool,
+    env: Frame | None,
+    budget: _Budget,
+    depth: int = 1,
+    macro_depth: int = 0,
+) -> int:
+    """
+    Return length of code of element without emitting it, running size steps
+    of nested elements with explicit stack. Sizes of memoized expansions are
+    computed once and sent back to size steps which yielded them, so time is
+    proportional to number of distinct expansions. Errors are raised as if
+    code was emitted, expansion containing itself raises RainDuckRecursionError.
+    depth and macro_depth are those of element.
+    """
+    # sizes of memoized expansions with depth and macro depth of nested ones
+    sizes: dict[tuple[CodeElement, Frame | None, bool], tuple[int, int, int]] = {}
+    active: set[tuple[CodeElement, Frame | None, bool]] = set()  # keys on stack
+    top = elem.size_steps(inverse, env)
+    # steps, key if memoized (None if not), whether size is discarded
+    stack: list[tuple[SizeSteps, Any, bool]] = [(top, None, False)]
+    totals = [0]  # sizes of expansions on stack
+    # depth and macro depth reached by expansions on stack
+    reached = [(depth, macro_depth)]
+    size = 0
+    error: BaseException | None = None
+    sent: int | None = None  # size of finished expansion to send to top steps
+    while stack:
+        step: str | int | Expansion | None
+        try:
+            if not (sent is None):
+                value, sent = sent, None
+                step = top.send(value)
+            elif error is None:
+                step = next(top)
+            else:
+                thrown, error = error, None
+                step = top.throw(thrown)
+        except StopIteration:
+            step = None
+        except Exception as e:
+            error, step = e, None
+        if isinstance(step, str):
+            totals[-1] += len(step)
+            continue
+        if isinstance(step, int):
+            totals[-1] += step
+            continue
+        top_depth = depth + len(stack) - 1
+        top_macro_depth = macro_depth + len(active)
+        if not (step is None):
+            nested, nested_inverse, nested_env, kind = step
+            key = None
+            if kind == _MEMOIZED:
+                key = (nested, nested_env, nested_inverse)
+                entry = sizes.get(key)
+                if not (entry is None):
+                    measured, height, macro_height = entry
+                    reach = (top_depth + height, top_macro_depth + macro_height)
+                    error = budget.exceeded(0, *reach)
+                    if not (error is None):
+                        continue
+                    reached[-1] = max(reached[-1][0], reach[0]), max(
+                        reached[-1][1], reach[1]
+                    )
+                    totals[-1] += measured
+                    sent = measured
+                    continue
+                if key in active:
+                    error = RainDuckRecursionError("Expansion contains itself.")
+                    continue
+            nested_macro_depth = top_macro_depth + (kind == _MEMOIZED)
+            error = budget.exceeded(0, top_depth + 1, nested_macro_depth)
+            if not (error is None):
+                continue
+            if not (key is None):
+                active.add(key)
+            top = nested.size_steps(nested_inverse, nested_env)
+            stack.append((top, key, kind == _DISCARDED))
+            totals.append(0)
+            reached.append((top_depth + 1, nested_macro_depth))
+            continue
+        # steps on top of stack are finished
+        _, key, discarded = stack.pop()
+        size = totals.pop()
+        deepest, macro_deepest = reached.pop()
+        if not (key is None):
+            active.discard(key)
+        if not stack:
+            break
+        top = stack[-1][0]
+        reached[-1] = max(reached[-1][0], deepest), max(reached[-1][1], macro_deepest)
+        if error is None:
+            if not (key is None):
+                height = deepest - top_depth + 1
+                sizes[key] = size, height, macro_deepest - top_macro_depth + 1
+            if not discarded:
+                totals[-1] += size
+            sent = size
+    if not (error is None):
+        raise error
+    return size
+
+
+def clear_memo() -> None:
+    global _memo_size
+    with _memo_lock:
+        _memo.clear()
+        _memo_size = 0
+
+
+def resolve(code: CodeElement) -> int:
+    """
+    Bind all macro calls in code to macros they call. Return number of
+    elements in code.
+    """
+    stack = [code]
+    count = 0
+    while stack:
+        elem = stack.pop()
+        count += 1
+        if isinstance(elem, MacroCall):
+            elem.resolve()
+        stack.extend(reversed(list(elem.children())))
+    return count
+
+
+def brainfuck_elements(chunks: Iterable[str]) -> list[BrainFuck]:
+    """
+    Build BrainFuck operations and loops from chunks of BrainFuck code,
+    joining runs of the same operation. Equal runs share one operation, so
+    repeated code takes one reference per run.
+    """
+    loops: list[list[BrainFuck]] = [[]]
+    code = loops[0]
+    operations: dict[str, BrainFuckOperation] = {}
+    for batch in _batches(chunks):
+        for c in _RUNS.findall(batch):
+            if c == "[":
+                code = []
+                loops.append(code)
+            elif c == "]":
+                loop = BrainFuckLoop(loops.pop(), None, None)
+                code = loops[-1]
+                code.append(loop)
+            elif (
+                code
+                and isinstance(last := code[-1], BrainFuckOperation)
+                and (last.code == c[0])
+            ):  # run split between batches
+                code[-1] = BrainFuckOperation(last.code, last.count + len(c))
+            elif (operation := operations.get(c)) is None:
+                operation = operations[c] = BrainFuckOperation(c[0], len(c))
+                code.append(operation)
+            else:
+                code.append(operation)
+    return loops[0]
+
+
+def _batches(chunks: Iterable[str]) -> Iterator[str]:
+    """Join small chunks of code to chunks of about CHUNK_SIZE."""
+    batch: list[str] = []
+    size = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= CHUNK_SIZE:
+            yield "".join(batch)
+            batch.clear()
+            size = 0
+    yield "".join(batch)
+
+
+def _operation(elem: CodeElement) -> CodeElement:
+    """Unwrap code blocks containing only one element."""
+    while isinstance(elem, CodeBlock) and len(elem.code) == 1:
+        elem = elem.code[0]
+    return elem
+
+
+def _repeat(code: str, num: int) -> Iterator[str]:
+    """Yield code repeated num times in chunks of about CHUNK_SIZE."""
+    per_chunk = max(1, CHUNK_SIZE // len(code))
+    full_chunks, rest = divmod(num, per_chunk)
+    if full_chunks:
+        chunk = code * per_chunk
+        for _ in range(full_chunks):
+            yield chunk
+    if rest:
+        yield code * rest
+
+
+_import_cache: dict[Path, tuple[dict[Path, tuple[int, int]], dict[str, Macro]]] = {}
+_import_chain: list[Path] = []
+_import_deps: list[dict[Path, tuple[int, int]]] = []
+
+
+def file_key(path: Path) -> tuple[int, int] | None:
+    """Modification time and size of file, None if it does not exist."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
 def _import(
     file_path: Path,
@@ -513,42 +1421,158 @@ def _import(
     line_pos: int | None = None,
     char_pos: int | None = None,
 ) -> dict[str, Macro]:
+    """
+    Import macros from file. Parsed files are cached by resolved path until
+    modification time or size of them or of files they import changes.
+    """
     path = file_path.parent / import_path
     if not path.is_file():
         raise RainDuckImportError(f"File {import_path} not found.", line_pos, char_pos)
-    with path.open() as f:
-        imported_code = f.read()
+    path = path.resolve()
+    chain = _import_chain or [file_path.resolve()]
+    if path in chain:
+        cycle = " -> ".join(str(p) for p in chain[chain.index(path) :] + [path])
+        raise RainDuckImportError(f"Import cycle: {cycle}", line_pos, char_pos)
+    cached = _import_cache.get(path)
+    if cached is not None and all(file_key(p) == k for p, k in cached[0].items()):
+        deps, imported_macros = cached
+    else:
+        key = cast(tuple[int, int], file_key(path))
+        with path.open() as f:
+            imported_code = f.read()
+        if (stored := cache.load(path, imported_code)) is not None:
+            hashes, imported_macros = stored
+            deps = {p: cast(tuple[int, int], file_key(p)) for p in hashes}
+            deps[path] = key
+            _import_cache[path] = (deps, imported_macros)
+        else:
+            deps = {path: key}
+            try:
+                imported_macros = _parse_import(path, imported_code, chain, deps)
+            except RainDuckError as e:
+                e.add_pointer(line_pos, char_pos, import_path)
+                raise e
+            cache.store(path, imported_code, list(deps), imported_macros)
+    if _import_deps:
+        _import_deps[-1].update(deps)
+    return {
+        name: Macro(import_path + ": " + m.name, m.args, m.code)
+        for name, m in imported_macros.items()
+    }
+
+
+def _parse_import(
+    path: Path, code: str, chain: list[Path], deps: dict[Path, tuple[int, int]]
+) -> dict[str, Macro]:
+    """Parse imported file, collecting paths of files it imports to deps."""
+    outer_chain = _import_chain[:]
+    _import_chain[:] = [*chain, path]
+    _import_deps.append(deps)
     try:
         from rainduck.transpiler import parse
 
-        imported_macros = parse(imported_code, path).macros
-    except RainDuckError as e:
-        e.add_pointer(line_pos, char_pos, import_path)
-        raise e
-    for m in imported_macros.values():
-        m.name = import_path + ": " + m.name
-    return imported_macros
+        macros = parse(code, path).macros
+    finally:
+        _import_chain[:] = outer_chain
+        _import_deps.pop()
+    _import_cache[path] = (deps, macros)
+    return macros
+
+
+@contextmanager
+def recorded_imports() -> Iterator[dict[Path, tuple[int, int]]]:
+    """Collect paths of files (transitively) imported in the with block."""
+    deps: dict[Path, tuple[int, int]] = {}
+    _import_deps.append(deps)
+    try:
+        yield deps
+    finally:
+        _import_deps.pop()
+
+
+def clear_import_cache() -> None:
+    _import_cache.clear()
+
+
+def _run(steps: Steps[T]) -> T:
+    """
+    Run generator of parsing steps and return its result. Generators it yields
+    are run the same way with explicit stack and their results (or exceptions)
+    are sent back to it.
+    """
+    stack: list[Steps[Any]] = [steps]
+    value: Any = None
+    error: BaseException | None = None
+    while True:
+        try:
+            if error is None:
+                step = stack[-1].send(value)
+            else:
+                step = stack[-1].throw(error)
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return cast(T, e.value)
+            value, error = e.value, None
+        except BaseException as e:
+            stack.pop()
+            if not stack:
+                raise
+            value, error = None, e
+        else:
+            stack.append(step)
+            value, error = None, None
 
 
 def _take_elem(
-    tokens: list[Token],
+    tokens: TokenArray,
+    pos: int,
+    end: int,
     parent: "CodeBlock | None" = None,
     file_path: Path | None = None,
-) -> CodeElement:
+) -> tuple[CodeElement, int] | Steps[tuple[CodeElement, int]]:
+    if pos >= end:
+        t = tokens.tokens[pos - 1]
+        raise RainDuckSyntaxError("Code element expected.", t.line_pos, t.char_pos)
     for elem_cls in code_elements:
-        elem = elem_cls.take(tokens, parent, file_path)
-        if not (elem is None):
-            return elem
-    t = tokens[0]
+        taken = elem_cls.take_steps(tokens, pos, end, parent, file_path)
+        if not (taken is None):
+            return taken
+    t = tokens.tokens[pos]
     raise RainDuckSyntaxError("Unrecognized pattern", t.line_pos, t.char_pos)
 
 
+def _parse_range(
+    tokens: TokenArray,
+    pos: int,
+    end: int,
+    parent: "CodeBlock | None" = None,
+    file_path: Path | None = None,
+) -> Steps[list[CodeElement]]:
+    result = []
+    while pos < end:
+        taken = _take_elem(tokens, pos, end, parent, file_path)
+        elem, pos = taken if isinstance(taken, tuple) else (yield taken)
+        result.append(elem)
+    return result
+
+
+def parse_range(
+    tokens: TokenArray,
+    pos: int,
+    end: int,
+    parent: "CodeBlock | None" = None,
+    file_path: Path | None = None,
+) -> list[CodeElement]:
+    """Parse all code elements between indexes pos and end of tokens."""
+    return _run(_parse_range(tokens, pos, end, parent, file_path))
+
+
 def parse_list(
     tokens: list[Token],
     parent: "CodeBlock | None" = None,
     file_path: Path | None = None,
 ) -> list[CodeElement]:
-    result = []
-    while tokens:
-        result.append(_take_elem(tokens, parent, file_path))
+    result = parse_range(TokenArray(tokens), 0, len(tokens), parent, file_path)
+    tokens.clear()
     return result
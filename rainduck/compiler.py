@@ -0,0 +1,234 @@
+import hashlib
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Iterator, MutableSequence, Sequence
+
+from rainduck.code_elements import BrainFuckLoop, BrainFuckOperation, CodeElement
+from rainduck.errors import RainDuckRuntimeError
+from rainduck.interpreter import EOF, make_tape
+
+CompiledProgram = Callable[
+    [MutableSequence[int], int, int, Callable[[int], None], Callable[[int], int]],
+    None,
+]
+
+MAX_NESTING = 16  # Python limits number of statically nested loops in function
+CACHE_SIZE = 64
+
+_cache: OrderedDict[str, CompiledProgram] = OrderedDict()
+
+
+def compile_program(code: Sequence[CodeElement]) -> CompiledProgram:
+    """
+    Compile transpiled BrainFuck code to Python function. Functions are
+    cached by hash of BrainFuck code.
+    """
+    digest = hashlib.sha256(
+        "".join(str(elem) for elem in code).encode("ascii")
+    ).hexdigest()
+    if digest in _cache:
+        _cache.move_to_end(digest)
+        return _cache[digest]
+    namespace: dict[str, CompiledProgram] = {}
+    exec(compile(python_source(code), f"<brainfuck {digest}>", "exec"), namespace)
+    program = namespace["program"]
+    _cache[digest] = program
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return program
+
+
+def python_source(code: Sequence[CodeElement]) -> str:
+    """
+    Return source of Python function 'program' doing the same as BrainFuck
+    code. Pointer moves between loops are folded to offsets and clear, move
+    and copy loops replaced by assignments. Nested loops are generated with
+    explicit stack, not recursively.
+    """
+    functions: list[list[str]] = []
+    lines = ["def program(t, M, S, put, get):", "    p = 0"]
+    block = _Block(code, 1, 0)
+    # blocks of loops being generated with enclosing blocks and functions the
+    # loops were moved to (None if loop is in enclosing block)
+    outer: list[tuple[_Block, list[str] | None]] = []
+    while True:
+        loop = block.add_elements()
+        if not (loop is None):
+            block.end_segment()
+            if block.nesting + 1 < MAX_NESTING:
+                block.lines.append("while t[p]:")
+                outer.append((block, None))
+                block = _Block(loop.code, 1, block.nesting + 1)
+                continue
+            # too deeply nested loop is moved to separate function
+            name = f"loop{len(functions)}"
+            function = [f"def {name}(t, p, M, S, put, get):"]
+            functions.append(function)
+            block.lines.append(f"p = {name}(t, p, M, S, put, get)")
+            outer.append((block, function))
+            block = _Block(loop.code, 2, 0)
+            continue
+        body = block.finish()
+        if not outer:
+            break
+        block, moved_to = outer.pop()
+        if moved_to is None:
+            block.lines += [*body, *([] if body else ["    pass"])]
+        else:
+            moved_to += ["    while t[p]:", *body, *([] if body else ["        pass"])]
+            moved_to.append("    return p")
+    lines += body
+    return "\n".join(line for f in [lines, *functions] for line in f) + "\n"
+
+
+class _Block:
+    """Lines of Python code doing the same as code, generated element by element."""
+
+    lines: list[str]
+    nesting: int
+    _elements: Iterator[CodeElement]
+    _indent: int
+    _segment: list[str]  # operations without loops, at offsets from p
+    _offsets: set[int]
+    _offset: int
+
+    def __init__(self, code: Sequence[CodeElement], indent: int, nesting: int) -> None:
+        self.lines = []
+        self.nesting = nesting
+        self._elements = iter(code)
+        self._indent = indent
+        self._segment = []
+        self._offsets = {0}
+        self._offset = 0
+
+    def add_elements(self) -> BrainFuckLoop | None:
+        """
+        Add code of elements up to loop which isn't replaced by assignments
+        and return it, return None when all elements are added.
+        """
+        segment, offsets = self._segment, self._offsets
+        for elem in self._elements:
+            offset = self._offset
+            cell = _cell(offset)
+            if isinstance(elem, BrainFuckOperation):
+                if elem.code in "<>":
+                    self._offset += elem.count if elem.code == ">" else -elem.count
+                    continue
+                offsets.add(offset)
+                if elem.code in "+-":
+                    n = elem.count if elem.code == "+" else -elem.count
+                    segment.append(f"{cell} = ({cell} + {n}) & M")
+                elif elem.code == ".":
+                    segment.extend(elem.count * [f"put({cell})"])
+                else:
+                    segment.extend(elem.count * [f"{cell} = get({cell})"])
+            elif isinstance(elem, BrainFuckLoop):
+                changes = _loop_changes(elem)
+                if changes is None:
+                    return elem
+                offsets.add(offset)
+                step = changes.pop(0)
+                if changes:
+                    segment.append(f"v = {cell}")
+                    segment.append("if v:")
+                    if step > 0:  # number of iterations
+                        segment.append("    v = -v & M")
+                    low, high = offset + min(changes), offset + max(changes)
+                    segment.extend("    " + line for line in _bounds_check(low, high))
+                    for change_offset, factor in changes.items():
+                        target = _cell(offset + change_offset)
+                        segment.append(f"    {target} = ({target} + {factor} * v) & M")
+                segment.append(f"{cell} = 0")
+        return None
+
+    def end_segment(self) -> None:
+        offset = self._offset
+        self._offsets.add(offset)
+        # check tape bounds once for whole segment
+        self.lines.extend(_bounds_check(min(self._offsets), max(self._offsets)))
+        self.lines.extend(self._segment)
+        if offset:
+            self.lines.append(f"p {'-' if offset < 0 else '+'}= {abs(offset)}")
+        self._segment.clear()
+        self._offsets.clear()
+        self._offsets.add(0)
+        self._offset = 0
+
+    def finish(self) -> list[str]:
+        """Return indented lines of code of all elements."""
+        self.end_segment()
+        return ["    " * self._indent + line for line in self.lines]
+
+
+def _cell(offset: int) -> str:
+    if offset:
+        return f"t[p {'-' if offset < 0 else '+'} {abs(offset)}]"
+    return "t[p]"
+
+
+def _bounds_check(low: int, high: int) -> list[str]:
+    """Return lines checking if cells from p + low to p + high are on tape."""
+    conditions = []
+    if low < 0:
+        conditions.append(f"p < {-low}")
+    if high > 0:
+        conditions.append(f"p >= S - {high}")
+    if conditions:
+        return [f"if {' or '.join(conditions)}:", "    raise IndexError"]
+    return []
+
+
+def _loop_changes(loop: BrainFuckLoop) -> dict[int, int] | None:
+    """
+    If loop only adds multiples of current cell to other cells and clears it
+    (e.g. '[-]', '[->+>++<<]'), return changes of cells at offsets, otherwise
+    None.
+    """
+    offset = 0
+    changes: dict[int, int] = {}
+    for elem in loop.code:
+        if not (isinstance(elem, BrainFuckOperation) and elem.code in "+-<>"):
+            return None
+        n = elem.count if elem.code in "+>" else -elem.count
+        if elem.code in "<>":
+            offset += n
+        else:
+            changes[offset] = changes.get(offset, 0) + n
+    if offset or changes.get(0) not in (-1, 1):
+        return None
+    return {o: n for o, n in changes.items() if n or o == 0}
+
+
+def run(
+    program: CompiledProgram,
+    input: BinaryIO,
+    output: BinaryIO,
+    tape_size: int = 30_000,
+    cell_bits: int = 8,
+    eof: EOF = EOF.ZERO,
+) -> None:
+    """Run compiled program reading input and writing output."""
+    mask = (1 << cell_bits) - 1
+    out = bytearray()
+
+    def put(value: int) -> None:
+        out.append(value & 0xFF)
+        if len(out) >= 1 << 12:
+            output.write(out)
+            out.clear()
+
+    def get(value: int) -> int:
+        output.write(out)
+        output.flush()
+        out.clear()
+        byte = input.read(1)
+        if byte:
+            return byte[0]
+        return {EOF.ZERO: 0, EOF.MINUS_ONE: mask, EOF.KEEP: value}[eof]
+
+    try:
+        program(make_tape(tape_size, cell_bits), mask, tape_size, put, get)
+    except IndexError:
+        raise RainDuckRuntimeError("Pointer moved out of tape.") from None
+    finally:
+        output.write(out)
+        output.flush()
@@ -51,7 +51,7 @@ class RainDuckError(Exception):
             + self.message
         )
         if self.traceback:
-            result += "\n" + "\n".join([str(t) for t in self.traceback[::-1]])
+            result += "\n" + "\n".join(_collapsed(self.traceback[::-1]))
         return result
 
     @property
@@ -90,6 +90,23 @@ class RainDuckError(Exception):
         return self.to_string(color=False)
 
 
+def _collapsed(traceback: list[PointerToCode]) -> list[str]:
+    """Pointers as lines, repeated ones (of recursive macros) only once."""
+    lines: list[str] = []
+    repeated = 0
+    for i, pointer in enumerate(traceback):
+        if i and pointer == traceback[i - 1]:
+            repeated += 1
+            continue
+        if repeated:
+            lines.append(f"(repeated {repeated} more times)")
+            repeated = 0
+        lines.append(str(pointer))
+    if repeated:
+        lines.append(f"(repeated {repeated} more times)")
+    return lines
+
+
 class RainDuckTokenError(RainDuckError):
     """Exception raised when error with tokenization of RainDuck code found."""
 
@@ -127,5 +144,23 @@ class RainDuckInversionError(RainDuckError):
     default_message = "Code can't be inverted"
 
 
+class RainDuckRecursionError(RainDuckError):
+    """Exception raised when expansion of macro contains itself infinitely."""
+
+    default_message = "Infinite recursion"
+
+
 class RainDuckImportError(RainDuckError):
     """Exception raised when fila can't be imported."""
+
+
+class RainDuckRuntimeError(RainDuckError):
+    """Exception raised when executed BrainFuck code fails."""
+
+    default_message = "Error while running code"
+
+
+class RainDuckLimitError(RainDuckError):
+    """Exception raised when transpilation exceeds its limits."""
+
+    default_message = "Limit of transpilation exceeded"
@@ -0,0 +1,216 @@
+import re
+from array import array
+from enum import Enum
+from typing import Any, BinaryIO, Iterable, MutableSequence, cast
+
+from rainduck.errors import RainDuckRuntimeError, RainDuckSyntaxError
+
+_ADD, _MOVE, _JUMP_ZERO, _JUMP_NONZERO, _CLEAR, _MULTIPLY, _OUTPUT, _INPUT = range(8)
+_COUNT = 8  # counts execution of following instructions, only in counted programs
+_RUNS = re.compile(r"[-+]+|[<>]+|\.|,|\[|\]")
+# typecodes of unsigned arrays by width of items, which depends on platform
+_TAPE_TYPES = {8 * array(t).itemsize: t for t in "QLIH"}
+
+
+class EOF(str, Enum):
+    """Value stored in cell by ',' at the end of input."""
+
+    ZERO = "zero"
+    MINUS_ONE = "minus-one"
+    KEEP = "keep"
+
+
+class Program:
+    """
+    BrainFuck code compiled to instructions of the interpreter. Runs of
+    operations are folded to one instruction and clear loops ('[-]') and
+    move or copy loops (e.g. '[->+>++<<]') are replaced by one instruction.
+
+    Counted program (of code without other characters than instructions)
+    also counts executions of every instruction, see executions.
+    """
+
+    ops: list[int]
+    args: list[Any]
+    counts: list[int] | None  # executions of straight runs of instructions
+    offsets: list[int] | None  # offsets of instructions in code if counted
+    _offset: int  # offset of run being added
+
+    def __init__(self, chunks: Iterable[str], counted: bool = False) -> None:
+        self.ops = []
+        self.args = []
+        self.counts = [] if counted else None
+        self.offsets = [] if counted else None
+        self._offset = 0
+        opened: list[int] = []
+        if counted:
+            self._count()
+        for chunk in chunks:
+            for run in _RUNS.findall(chunk):
+                c = run[0]
+                if c in "+-":
+                    self._add_run(_ADD, run.count("+") - run.count("-"))
+                elif c in "<>":
+                    self._add_run(_MOVE, run.count(">") - run.count("<"))
+                elif c == "[":
+                    opened.append(len(self.ops))
+                    self._add(_JUMP_ZERO)
+                    if counted:
+                        self._count()
+                elif c == "]":
+                    if not opened:
+                        raise RainDuckSyntaxError("Unexpected ']'")
+                    self._close_loop(opened.pop())
+                    if counted and self.ops[-1] == _JUMP_NONZERO:
+                        self._count()
+                else:
+                    self._add(_OUTPUT if c == "." else _INPUT)
+                if counted:
+                    self._offset += len(run)
+        if opened:
+            raise RainDuckSyntaxError("Missing ']'")
+
+    def _add(self, op: int, arg: Any = None, offset: int | None = None) -> None:
+        """Add operation which begins at offset (of current run by default)."""
+        self.ops.append(op)
+        self.args.append(arg)
+        if not (self.offsets is None):
+            self.offsets.append(self._offset if offset is None else offset)
+
+    def _count(self) -> None:
+        """Add instruction counting executions of instructions after it."""
+        counts = cast(list[int], self.counts)
+        self._add(_COUNT, len(counts))
+        counts.append(0)
+
+    def _add_run(self, op: int, n: int) -> None:
+        """Add operation, joining it with the previous one if possible."""
+        offset = None
+        if self.ops and self.ops[-1] == op:
+            self.ops.pop()
+            n += self.args.pop()
+            if not (self.offsets is None):
+                offset = self.offsets.pop()
+        if n:
+            self._add(op, n, offset)
+
+    def _close_loop(self, start: int) -> None:
+        ops, args, offsets = self.ops, self.args, self.offsets
+        counted = not (offsets is None)
+        body = range(start + 1 + counted, len(ops))  # after counting instruction
+        if all(ops[i] in (_ADD, _MOVE) for i in body):
+            offset = 0
+            changes: dict[int, int] = {}
+            for i in body:
+                if ops[i] == _MOVE:
+                    offset += args[i]
+                else:
+                    changes[offset] = changes.get(offset, 0) + args[i]
+            step = changes.pop(0, 0)
+            if offset == 0 and step in (-1, 1):
+                # loop runs until the current cell is zero, changing the others
+                del ops[start:], args[start:]
+                loop_offset = None
+                if not (offsets is None):
+                    loop_offset = offsets[start]
+                    del offsets[start:]
+                if changes:
+                    factors = [(o, n) for o, n in changes.items() if n]
+                    arg = (factors, min(changes), max(changes), step)
+                    self._add(_MULTIPLY, arg, loop_offset)
+                else:
+                    self._add(_CLEAR, None, loop_offset)
+                return
+        self._add(_JUMP_NONZERO, start + 1)
+        args[start] = len(ops)
+
+    def executions(self) -> list[tuple[int, int]]:
+        """
+        Offsets of instructions of counted program run by run, with number of
+        times they were executed.
+        """
+        counts, offsets = cast(list[int], self.counts), cast(list[int], self.offsets)
+        result = []
+        count = 0
+        for op, arg, offset in zip(self.ops, self.args, offsets):
+            if op == _COUNT:
+                count = counts[arg]
+            else:
+                result.append((offset, count))
+        return result
+
+
+def make_tape(tape_size: int, cell_bits: int) -> MutableSequence[int]:
+    """Return tape of zero cells with given width."""
+    if cell_bits == 8:
+        return bytearray(tape_size)
+    if cell_bits in _TAPE_TYPES:
+        return array(_TAPE_TYPES[cell_bits], [0]) * tape_size
+    raise ValueError(f"Unsupported cell width: {cell_bits} bits")
+
+
+def run(
+    program: Program,
+    input: BinaryIO,
+    output: BinaryIO,
+    tape_size: int = 30_000,
+    cell_bits: int = 8,
+    eof: EOF = EOF.ZERO,
+) -> None:
+    """Run compiled BrainFuck program reading input and writing output."""
+    ops, args, counts = program.ops, program.args, program.counts
+    mask = (1 << cell_bits) - 1
+    tape = make_tape(tape_size, cell_bits)
+    out = bytearray()
+    ptr = pc = 0
+    end = len(ops)
+    while pc < end:
+        op = ops[pc]
+        if op == _ADD:
+            tape[ptr] = (tape[ptr] + args[pc]) & mask
+        elif op == _MOVE:
+            ptr += args[pc]
+            if not 0 <= ptr < tape_size:
+                raise RainDuckRuntimeError(f"Pointer moved out of tape to {ptr}.")
+        elif op == _JUMP_ZERO:
+            if not tape[ptr]:
+                pc = args[pc]
+                continue
+        elif op == _JUMP_NONZERO:
+            if tape[ptr]:
+                pc = args[pc]
+                continue
+        elif op == _CLEAR:
+            tape[ptr] = 0
+        elif op == _MULTIPLY:
+            value = tape[ptr]
+            if value:
+                factors, low, high, step = args[pc]
+                if not 0 <= ptr + low <= ptr + high < tape_size:
+                    raise RainDuckRuntimeError("Pointer moved out of tape.")
+                if step > 0:  # number of iterations
+                    value = -value & mask
+                for offset, factor in factors:
+                    tape[ptr + offset] = (tape[ptr + offset] + factor * value) & mask
+                tape[ptr] = 0
+        elif op == _OUTPUT:
+            out.append(tape[ptr] & 0xFF)
+            if len(out) >= 1 << 12:
+                output.write(out)
+                out.clear()
+        elif op == _COUNT:
+            cast(list[int], counts)[args[pc]] += 1
+        else:
+            output.write(out)
+            output.flush()
+            out.clear()
+            byte = input.read(1)
+            if byte:
+                tape[ptr] = byte[0]
+            elif eof == EOF.ZERO:
+                tape[ptr] = 0
+            elif eof == EOF.MINUS_ONE:
+                tape[ptr] = mask
+        pc += 1
+    output.write(out)
+    output.flush()
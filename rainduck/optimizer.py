@@ -0,0 +1,80 @@
+from typing import Iterator, Sequence
+
+from rainduck.code_elements import (
+    BrainFuck,
+    BrainFuckLoop,
+    BrainFuckOperation,
+    CodeElement,
+)
+
+_OPPOSITE = {"+": "-", "-": "+", "<": ">", ">": "<"}
+
+
+def optimize(code: Sequence[BrainFuck], level: int = 1) -> list[BrainFuck]:
+    """
+    Optimize transpiled BrainFuck code without changing its behaviour.
+
+    Level 1 joins runs of operations, cancels adjacent inverse operations
+    (e.g. '>><' to '>') and removes loops which can never run (directly after
+    other loop or before any cell is changed). Level 2 also replaces '[+]' by
+    '[-]', which is the same on interpreters with wrapping cells.
+    """
+    if level <= 0:
+        return list(code)
+    return _optimize(code, level, True)
+
+
+def _optimize(
+    code: Sequence[CodeElement], level: int, untouched: bool
+) -> list[BrainFuck]:
+    """
+    Optimize code. If untouched is True, all cells are zero at its beginning.
+    Nested loops are optimized with explicit stack, not recursively.
+    """
+    result: list[BrainFuck] = []
+    elements = iter(code)
+    # loops being optimized with elements after them and result before them
+    outer: list[tuple[BrainFuckLoop, Iterator[CodeElement], list[BrainFuck]]] = []
+    while True:
+        for elem in elements:
+            if isinstance(elem, BrainFuckOperation):
+                if elem.code in "+-,":
+                    untouched = False
+                last = result[-1] if result else None
+                if not isinstance(last, BrainFuckOperation):
+                    result.append(elem)
+                elif last.code == elem.code:
+                    result[-1] = BrainFuckOperation(elem.code, last.count + elem.count)
+                elif _OPPOSITE.get(elem.code) == last.code:
+                    result.pop()
+                    if last.count > elem.count:
+                        result.append(
+                            BrainFuckOperation(last.code, last.count - elem.count)
+                        )
+                    elif last.count < elem.count:
+                        result.append(
+                            BrainFuckOperation(elem.code, elem.count - last.count)
+                        )
+                else:
+                    result.append(elem)
+            elif isinstance(elem, BrainFuckLoop):
+                if untouched or (result and isinstance(result[-1], BrainFuckLoop)):
+                    continue  # current cell is zero, so loop can never run
+                outer.append((elem, elements, result))
+                elements, result = iter(elem.code), []
+                break
+            else:
+                raise TypeError(f"Not transpiled BrainFuck code: {elem!r}")
+        else:
+            if not outer:
+                return result
+            body = result
+            loop, elements, result = outer.pop()
+            if (
+                level >= 2
+                and len(body) == 1
+                and isinstance(body[0], BrainFuckOperation)
+                and str(body[0]) == "+"
+            ):
+                body = [BrainFuckOperation("-")]
+            result.append(BrainFuckLoop(body, loop.line_pos, loop.char_pos))
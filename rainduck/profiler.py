@@ -0,0 +1,198 @@
+"""Profiler of macro expansions.
+
+While Profiler is active (used as context manager), emitted code is counted
+to stack of macros being expanded. Memoized expansions are recorded once as
+fragments and added again (without time) to stacks of expansions reusing
+them, so counts are the same as if every expansion was done again. Code of
+discarded expansions (multiplied by zero) is not profiled.
+"""
+
+import dataclasses
+import time
+from typing import Any, Self
+
+from rainduck import code_elements
+from rainduck.code_elements import CodeElement, Macro, MacroCall, Tracer
+
+
+class _Node:
+    """Macro on stack of expansions, or root of fragment or of profile."""
+
+    __slots__ = ("calls", "instructions", "seconds", "children", "fragments")
+
+    calls: int
+    instructions: int  # emitted by the macro itself, not by nested macros
+    seconds: float
+    children: dict[str, "_Node"]
+    # fragments emitted in the macro: [times reused, times expanded]
+    fragments: dict["_Node", list[int]]
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.instructions = 0
+        self.seconds = 0.0
+        self.children = {}
+        self.fragments = {}
+
+    def child(self, name: str) -> "_Node":
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Node()
+        return node
+
+
+@dataclasses.dataclass
+class MacroProfile:
+    name: str
+    calls: int = 0
+    instructions: int = 0  # emitted by the macro itself
+    inclusive: int = 0  # including nested macros
+    seconds: float = 0.0  # spent expanding, including nested macros
+
+
+class Profiler(Tracer):
+    """Counts of calls, emitted instructions and time of macros."""
+
+    root_name: str
+    _root: _Node
+    _stack: list[tuple[int, _Node, float, bool]]  # depth, node, start, fragment
+    _node: _Node  # node emitted code is counted to
+    _fragments: dict[Any, _Node]  # by memo key
+    _start: float
+
+    def __init__(self, root_name: str = "main") -> None:
+        self.root_name = root_name
+        self._root = self._node = _Node()
+        self._root.calls = 1
+        self._stack = []
+        self._fragments = {}
+        self._start = 0.0
+
+    def __enter__(self) -> Self:
+        # expansions memoized without profiler have no fragments
+        code_elements.clear_memo()
+        self._start = time.perf_counter()
+        return super().__enter__()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._root.seconds += time.perf_counter() - self._start
+        super().__exit__(*exc_info)
+
+    def count(self, instructions: int) -> None:
+        self._node.instructions += instructions
+
+    def push(self, elem: CodeElement, depth: int, key: Any = None) -> None:
+        if not (key is None):
+            self._node = _Node()
+            self._stack.append((depth, self._node, 0.0, True))
+        if type(elem) is MacroCall and isinstance(elem.target, Macro):
+            self._node = self._node.child(elem.target.name)
+            self._node.calls += 1
+            self._stack.append((depth, self._node, time.perf_counter(), False))
+
+    def memoized(self, key: Any) -> None:
+        self._fragments[key] = next(n for _, n, _, f in reversed(self._stack) if f)
+
+    def pop(self, depth: int) -> None:
+        while self._stack and self._stack[-1][0] == depth:
+            _, node, start, fragment = self._stack.pop()
+            self._node = self._stack[-1][1] if self._stack else self._root
+            if fragment:
+                self._node.fragments.setdefault(node, [0, 0])[1] += 1
+            else:
+                node.seconds += time.perf_counter() - start
+
+    def reuse(self, key: Any, instructions: int) -> None:
+        fragment = self._fragments.get(key)
+        if fragment is None:  # memoized by other thread
+            self._node.instructions += instructions
+        else:
+            self._node.fragments.setdefault(fragment, [0, 0])[0] += 1
+
+    def tree(self) -> _Node:
+        """Profile with fragments added to stacks they were emitted in."""
+        tree = _Node()
+        tree.calls = self._root.calls
+        tree.seconds = self._root.seconds
+        # node of tree, recorded node, times it was emitted, whether expanded
+        stack = [(tree, self._root, 1, True)]
+        while stack:
+            node, recorded, times, expanded = stack.pop()
+            node.instructions += recorded.instructions * times
+            for name, child in recorded.children.items():
+                tree_child = node.child(name)
+                tree_child.calls += child.calls * times
+                if expanded:
+                    tree_child.seconds += child.seconds
+                stack.append((tree_child, child, times, expanded))
+            for fragment, (reused, expanded_times) in recorded.fragments.items():
+                emitted = times * (reused + expanded_times)
+                stack.append((node, fragment, emitted, expanded and expanded_times > 0))
+        return tree
+
+    def macros(self) -> list[MacroProfile]:
+        """Profiles of macros sorted by inclusive emitted instructions."""
+        profiles: dict[str, MacroProfile] = {}
+        tree = self.tree()
+        inclusive = _inclusive(tree)
+        on_stack: dict[str, int] = {}  # number of nodes with name on stack
+        stack: list[tuple[str, _Node, bool]] = [(self.root_name, tree, False)]
+        while stack:
+            name, node, finished = stack.pop()
+            if finished:
+                on_stack[name] -= 1
+                continue
+            profile = profiles.get(name)
+            if profile is None:
+                profile = profiles[name] = MacroProfile(name)
+            profile.calls += node.calls
+            profile.instructions += node.instructions
+            if not on_stack.get(name):  # recursive calls are already included
+                profile.inclusive += inclusive[node]
+                profile.seconds += node.seconds
+            on_stack[name] = on_stack.get(name, 0) + 1
+            stack.append((name, node, True))
+            stack.extend((n, child, False) for n, child in node.children.items())
+        return sorted(profiles.values(), key=lambda p: (-p.inclusive, p.name))
+
+    def report(self) -> str:
+        lines = [
+            f"{'calls':>10} {'self':>12} {'inclusive':>12} {'time (ms)':>10}  macro"
+        ]
+        for p in self.macros():
+            lines.append(
+                f"{p.calls:>10} {p.instructions:>12} {p.inclusive:>12}"
+                f" {p.seconds * 1000:>10.1f}  {p.name}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        """
+        Stacks of macros with instructions emitted by the last one, one per
+        line, in collapsed format of flamegraph tools.
+        """
+        lines = []
+        stack = [(self.root_name, self.tree())]
+        while stack:
+            path, node = stack.pop()
+            if node.instructions:
+                lines.append(f"{path} {node.instructions}")
+            for name, child in reversed(node.children.items()):
+                stack.append((f"{path};{name}", child))
+        return "".join(line + "\n" for line in lines)
+
+
+def _inclusive(tree: _Node) -> dict[_Node, int]:
+    """Instructions emitted by nodes of tree including their children."""
+    result: dict[_Node, int] = {}
+    stack = [(tree, False)]
+    while stack:
+        node, finished = stack.pop()
+        if finished:
+            result[node] = node.instructions + sum(
+                result[child] for child in node.children.values()
+            )
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children.values())
+    return result
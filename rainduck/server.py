@@ -0,0 +1,106 @@
+"""Long-lived transpilation server answering JSON requests, one per line.
+
+Request is object with either "code" (RainDuck code, optionally with
+"file_path" used for imports) or "path" (file to transpile), optional
+"optimize" level and "id", which is copied to response. Response is
+{"id": ..., "ok": true, "code": BrainFuck code} or {"id": ..., "ok": false,
+"error": {"type": ..., "message": ..., "traceback": [pointers]}}.
+
+Run with `rainduck serve` or `python -m rainduck.server`.
+"""
+
+import dataclasses
+import json
+import os
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, TextIO, cast
+
+from rainduck.code_elements import Limits
+from rainduck.errors import RainDuckError
+from rainduck.transpiler import transpile
+
+_lock = threading.Lock()  # imports are parsed with module-level state
+limits: Limits | None = None  # limits of every transpilation
+
+
+def _error(kind: str, message: str, traceback: list[Any] = []) -> dict[str, Any]:
+    return {"type": kind, "message": message, "traceback": traceback}
+
+
+def handle(request: Any) -> dict[str, Any]:
+    """Transpile code given by request and return response."""
+    if not isinstance(request, dict):
+        return {"id": None, "ok": False, "error": _error("Request", "Not object.")}
+    response: dict[str, Any] = {"id": request.get("id"), "ok": False}
+    optimize = request.get("optimize", 0)
+    code, path = request.get("code"), request.get("path")
+    file_path = request.get("file_path", path)
+    if not (
+        isinstance(optimize, int)
+        and isinstance(code, str) != isinstance(path, str)
+        and (file_path is None or isinstance(file_path, str))
+    ):
+        response["error"] = _error("Request", "Invalid request.")
+        return response
+    try:
+        if isinstance(path, str):
+            with open(path) as f:
+                code = f.read()
+        with _lock:
+            response["code"] = transpile(
+                cast(str, code),
+                None if file_path is None else Path(file_path),
+                optimize,
+                limits=limits,
+            )
+    except RainDuckError as e:
+        traceback = [dataclasses.asdict(p) for p in e.traceback]
+        response["error"] = _error(e.name, e.message, traceback)
+        return response
+    except (OSError, UnicodeDecodeError, RecursionError) as e:
+        response["error"] = _error(type(e).__name__, str(e))
+        return response
+    response["ok"] = True
+    return response
+
+
+def _respond(line: str) -> str:
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response = {"id": None, "ok": False, "error": _error("Request", str(e))}
+    else:
+        response = handle(request)
+    return json.dumps(response) + "\n"
+
+
+def serve_stream(input: TextIO, output: TextIO) -> None:
+    """Answer requests read from input until it is closed."""
+    for line in input:
+        if line.strip():
+            output.write(_respond(line))
+            output.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(_respond(line.decode()).encode())
+
+
+def serve_socket(path: str) -> None:
+    """Answer requests sent to Unix socket at path, each connection in thread."""
+    server = socketserver.ThreadingUnixStreamServer(path, _Handler)
+    try:
+        with server:
+            server.serve_forever()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    serve_stream(sys.stdin, sys.stdout)
@@ -0,0 +1,283 @@
+"""Source maps of transpiled BrainFuck code and attribution of executed
+instructions to RainDuck source.
+
+Source map maps ranges of offsets in BrainFuck code to location of the
+innermost macro call, loop or multiplication which emitted them: file, line,
+char and stack of called macros. Ranges and locations are kept in arrays,
+stacks of macros share their prefixes. While source map is recorded, memoized
+expansions are not reused, so every range is emitted by its own expansion.
+"""
+
+import json
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable, NamedTuple, TextIO
+
+from rainduck import code_elements
+from rainduck.code_elements import (
+    BrainFuckLoop,
+    CodeBlock,
+    CodeElement,
+    Limits,
+    Macro,
+    MacroCall,
+    Multiplication,
+    Tracer,
+    recorded_imports,
+)
+from rainduck.stats import Stats
+
+VERSION = 1
+
+
+class Location(NamedTuple):
+    file: str | None
+    line: int | None
+    char: int | None
+    macros: tuple[str, ...]  # stack of called macros, outermost first
+
+
+class SourceMap(Tracer):
+    """Map of ranges of BrainFuck code to locations, recorded as tracer."""
+
+    reuses_memo = False
+
+    files: list[str | None]
+    stacks: list[tuple[int, str]]  # index of parent stack (-1 if none), macro
+    locations: list[tuple[int, int, int, int]]  # file, line, char, stack
+    starts: "array[int]"  # offsets where ranges begin
+    indices: "array[int]"  # indices of locations of ranges
+    length: int  # length of mapped code
+    _file_indices: dict[str | None, int]
+    _stack_indices: dict[tuple[int, str], int]
+    _location_indices: dict[tuple[int, int, int, int], int]
+    _element_files: dict[int, int]  # file indices by ids of elements
+    _stack: list[tuple[int, int, int]]  # depth, location, stack of expansion
+    _root: int  # location of code outside of macros, loops and multiplications
+    _location: int  # location of emitted code
+    _macros: int  # stack of macros of emitted code
+
+    def __init__(self) -> None:
+        self.files = []
+        self.stacks = []
+        self.locations = []
+        self.starts = array("q")
+        self.indices = array("l")
+        self.length = 0
+        self._file_indices = {}
+        self._stack_indices = {}
+        self._location_indices = {}
+        self._element_files = {}
+        self._stack = []
+        self._root = self._location = self._macros = -1
+
+    def add_files(
+        self, code: CodeElement, file_path: Path | None, imported: Iterable[Path]
+    ) -> None:
+        """
+        Record files elements of code (parsed from file_path) and of files it
+        imported come from. It must be called before code is emitted.
+        """
+        for path in imported:
+            cached = code_elements._import_cache.get(path)
+            for macro in [] if cached is None else cached[1].values():
+                if ": " in macro.name:  # imported to the file from other one
+                    continue
+                root = macro.code
+                while isinstance(root, CodeBlock) and not (root.parent is None):
+                    root = root.parent
+                self._add_file(root, str(path))
+        file = self._add_file(code, None if file_path is None else str(file_path))
+        self._root = self._location = self._intern_location(file, -1, -1, -1)
+
+    def _add_file(self, code: CodeElement, file: str | None) -> int:
+        index = self._file_indices.get(file)
+        if index is None:
+            index = self._file_indices[file] = len(self.files)
+            self.files.append(file)
+        stack = [code]
+        while stack:
+            elem = stack.pop()
+            if id(elem) in self._element_files:
+                continue
+            self._element_files[id(elem)] = index
+            stack.extend(elem.children())
+        return index
+
+    def _intern_location(self, file: int, line: int, char: int, stack: int) -> int:
+        location = (file, line, char, stack)
+        index = self._location_indices.get(location)
+        if index is None:
+            index = self._location_indices[location] = len(self.locations)
+            self.locations.append(location)
+        return index
+
+    def __exit__(self, *exc_info: object) -> None:
+        super().__exit__(*exc_info)
+        self._element_files.clear()  # ids may be reused by other elements
+        self._stack.clear()
+
+    def count(self, instructions: int) -> None:
+        if not (self.indices and self.indices[-1] == self._location):
+            self.starts.append(self.length)
+            self.indices.append(self._location)
+        self.length += instructions
+
+    def push(self, elem: CodeElement, depth: int, key: object = None) -> None:
+        if not isinstance(elem, (MacroCall, BrainFuckLoop, Multiplication)):
+            return
+        line_pos, char_pos = elem.line_pos, elem.char_pos
+        macros = self._macros
+        if isinstance(elem, MacroCall) and isinstance(elem.target, Macro):
+            frame = (macros, elem.target.name)
+            macros = self._stack_indices.get(frame, -1)
+            if macros < 0:
+                macros = self._stack_indices[frame] = len(self.stacks)
+                self.stacks.append(frame)
+        file = self._element_files.get(id(elem), self.locations[self._location][0])
+        self._location = self._intern_location(
+            file,
+            -1 if line_pos is None else line_pos,
+            -1 if char_pos is None else char_pos,
+            macros,
+        )
+        self._macros = macros
+        self._stack.append((depth, self._location, macros))
+
+    def pop(self, depth: int) -> None:
+        if self._stack and self._stack[-1][0] == depth:
+            self._stack.pop()
+            if self._stack:
+                _, self._location, self._macros = self._stack[-1]
+            else:
+                self._location, self._macros = self._root, -1
+
+    def location(self, index: int) -> Location:
+        """Location with given index."""
+        file, line, char, stack = self.locations[index]
+        macros = []
+        while stack >= 0:
+            stack, name = self.stacks[stack]
+            macros.append(name)
+        return Location(
+            self.files[file],
+            None if line < 0 else line,
+            None if char < 0 else char,
+            tuple(reversed(macros)),
+        )
+
+    def index(self, offset: int) -> int:
+        """Index of location of code at offset."""
+        if not 0 <= offset < self.length:
+            raise IndexError(f"Offset {offset} out of mapped code.")
+        return self.indices[bisect_right(self.starts, offset) - 1]
+
+    def lookup(self, offset: int) -> Location:
+        """Location of code at offset."""
+        return self.location(self.index(offset))
+
+    def dump(self, file: TextIO) -> None:
+        json.dump(
+            {
+                "version": VERSION,
+                "length": self.length,
+                "files": self.files,
+                "stacks": self.stacks,
+                "locations": self.locations,
+                "starts": self.starts.tolist(),
+                "indices": self.indices.tolist(),
+            },
+            file,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def load(cls, file: TextIO) -> "SourceMap":
+        data = json.load(file)
+        if data.get("version") != VERSION:
+            raise ValueError("Unsupported version of source map.")
+        source_map = cls()
+        source_map.length = data["length"]
+        source_map.files = data["files"]
+        source_map.stacks = [(parent, name) for parent, name in data["stacks"]]
+        source_map.locations = [tuple(location) for location in data["locations"]]
+        source_map.starts = array("q", data["starts"])
+        source_map.indices = array("l", data["indices"])
+        return source_map
+
+
+def transpile(
+    code: str,
+    file_path: Path | None = None,
+    limits: Limits | None = None,
+    stats: Stats | None = None,
+) -> tuple[str, SourceMap]:
+    """
+    Transpile RainDuck code to BrainFuck code with its source map. If stats
+    are given, phases of transpilation are recorded to them, mapping as part
+    of transpile phase.
+    """
+    from rainduck.transpiler import parse
+
+    try:
+        with recorded_imports() as imported:
+            block = parse(code, file_path, stats)
+        if not (stats is None):
+            stats.start("transpile")
+        source_map = SourceMap()
+        source_map.add_files(block, file_path, imported)
+        with source_map:
+            chunks = list(block.emit(limits=limits))
+        if not (stats is None):
+            stats.count("transpile", len(chunks))
+    finally:
+        if not (stats is None):
+            stats.start(None)
+    return "".join(chunks), source_map
+
+
+class Hotspot(NamedTuple):
+    name: str  # file and line or macro
+    executions: int  # including nested macros for macros
+
+
+def hotspots(
+    source_map: SourceMap, executions: Iterable[tuple[int, int]]
+) -> tuple[list[Hotspot], list[Hotspot]]:
+    """
+    Attribute executions of instructions at offsets of mapped code to source
+    lines and to macros (including macros they call). Return both sorted by
+    number of executions.
+    """
+    by_location: dict[int, int] = {}
+    for offset, count in executions:
+        if count:
+            index = source_map.index(offset)
+            by_location[index] = by_location.get(index, 0) + count
+    lines: dict[str, int] = {}
+    macros: dict[str, int] = {}
+    for index, count in by_location.items():
+        location = source_map.location(index)
+        line_pos = "?" if location.line is None else location.line
+        line = f"{location.file or '<code>'}:{line_pos}"
+        lines[line] = lines.get(line, 0) + count
+        for name in set(location.macros):
+            macros[name] = macros.get(name, 0) + count
+    return _sorted(lines), _sorted(macros)
+
+
+def _sorted(counts: dict[str, int]) -> list[Hotspot]:
+    return sorted(
+        (Hotspot(name, count) for name, count in counts.items()),
+        key=lambda h: (-h.executions, h.name),
+    )
+
+
+def report(lines: list[Hotspot], macros: list[Hotspot], limit: int = 20) -> str:
+    """Table of the most executed lines and macros."""
+    result = [f"{'executions':>12}  line"]
+    result.extend(f"{h.executions:>12}  {h.name}" for h in lines[:limit])
+    result.append(f"{'executions':>12}  macro")
+    result.extend(f"{h.executions:>12}  {h.name}" for h in macros[:limit])
+    return "\n".join(result) + "\n"
@@ -0,0 +1,85 @@
+"""Wall time, sizes and peak memory of transpilation phases.
+
+Transpiler functions given Stats record phases tokenize, parse, transpile
+(emitting and optimizing) and write (joining or writing the output). Phases
+may interleave (code is written as it is emitted), their times and sizes
+add up. Peak memory is the largest memory traced by tracemalloc during the
+phase, including memory allocated before it and still in use.
+"""
+
+import dataclasses
+import time
+import tracemalloc
+
+UNITS = {
+    "tokenize": "tokens",
+    "parse": "elements",
+    "transpile": "chunks",
+    "write": "bytes",
+}
+
+
+@dataclasses.dataclass
+class Phase:
+    name: str
+    unit: str
+    seconds: float = 0.0
+    count: int = 0
+    peak: int = 0  # bytes
+
+
+class Stats:
+    """Phases of one transpilation, measured one at a time."""
+
+    phases: dict[str, Phase]
+    current: Phase | None
+    _started: float
+    _tracing: bool  # whether tracemalloc was started by stats
+
+    def __init__(self) -> None:
+        self.phases = {name: Phase(name, unit) for name, unit in UNITS.items()}
+        self.current = None
+        self._started = 0.0
+        self._tracing = False
+
+    def start(self, name: str | None) -> None:
+        """End current phase and start phase name (None ends measuring)."""
+        now = time.perf_counter()
+        if self.current is None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+        else:
+            self.current.seconds += now - self._started
+            peak = tracemalloc.get_traced_memory()[1]
+            self.current.peak = max(self.current.peak, peak)
+        if name is None:
+            self.current = None
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+            return
+        tracemalloc.reset_peak()
+        self.current = self.phases[name]
+        self._started = time.perf_counter()
+
+    def count(self, name: str, count: int) -> None:
+        self.phases[name].count += count
+
+    def table(self) -> str:
+        lines = [f"{'phase':<10} {'time (ms)':>10} {'peak (KB)':>10} {'size':>10}"]
+        for p in self.phases.values():
+            lines.append(
+                f"{p.name:<10} {p.seconds * 1000:>10.1f} {p.peak // 1024:>10}"
+                f" {p.count:>10} {p.unit}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def json(self) -> str:
+        import json
+
+        return json.dumps([dataclasses.asdict(p) for p in self.phases.values()]) + "\n"
+
+    def report(self, format: str = "table") -> str:
+        """Phases formatted as table or as JSON list of objects."""
+        return self.json() if format == "json" else self.table()
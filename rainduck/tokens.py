@@ -1,4 +1,6 @@
+import re
 from dataclasses import dataclass
+from typing import cast
 
 from rainduck import errors
 
@@ -35,98 +37,145 @@ class Special:
 Token = Word | Number | Char | Special
 
 
-def _take_word(
-    first: str, rest: list[str], line_pos: int, char_pos: int
-) -> tuple[Word, int]:
+_WORD_REST = re.compile(r"\w*")
+_NUMBER_REST = re.compile(r"(?:\d|_(?=\d))*")
+_PARENTHESES = re.compile(r"[()\n]")
+
+
+def _take_word(code: str, start: int, line_pos: int, char_pos: int) -> tuple[Word, int]:
     """
-    Remove characters forming a word (i.e. keyword or macro) from list with
-    RainDuck code and return it as a Word instance. Also take position of
-    beginning of the word on current line and return position of end, so
-    tokenization can continue.
+    Take characters forming a word (i.e. keyword or macro) beginning at index
+    start of RainDuck code and return it as a Word instance together with
+    index of the first character after the word, so tokenization can continue.
     """
-    word = first
-    while rest[0].isalnum() or rest[0] == "_":
-        word += rest.pop(0)
-    return Word(word, line_pos, char_pos), char_pos + len(word) - 1
+    end = cast(re.Match[str], _WORD_REST.match(code, start)).end()
+    return Word(code[start:end], line_pos, char_pos), end
 
 
 def _take_num(
-    first: str, rest: list[str], line_pos: int, char_pos: int
+    code: str, start: int, line_pos: int, char_pos: int
 ) -> tuple[Number, int]:
     """
-    Remove characters forming a number from beginning of list with
-    RainDuck code and return it as a number instance. Also take position of
-    beginning of the number on current line and return position of end, so
-    tokenization can continue.
+    Take characters forming a number beginning at index start of RainDuck
+    code (its first character, digit or '-', is already checked) and return it
+    as a Number instance together with index of the first character after the
+    number, so tokenization can continue.
     """
-    number = first
-    while rest[0].isdecimal() or (rest[0] == "_" and rest[1].isdecimal()):
-        number += rest.pop(0)
-    return Number(int(number), line_pos, char_pos), char_pos + len(number) - 1
+    end = cast(re.Match[str], _NUMBER_REST.match(code, start + 1)).end()
+    return Number(int(code[start:end]), line_pos, char_pos), end
 
 
 def _take_special(
-    code: list[str], line_pos: int, char_pos: int
-) -> tuple[Special, int, int]:
-    start_line_pos = line_pos
-    start_char_pos = char_pos
-    if not code:
+    code: str, start: int, line_pos: int, char_pos: int, line_start: int
+) -> tuple[Special, int, int, int]:
+    """
+    Take special expression (e.g. '#import(file.rd)') whose name begins at
+    index start of RainDuck code. Return it as a Special instance together
+    with index after its end and line number and line start index valid
+    after it.
+    """
+    if start >= len(code):
         raise errors.RainDuckSyntaxError(
             "Expected special expression name.", line_pos, char_pos
         )
-    name, char_pos = _take_word("", code, line_pos, char_pos)
+    name, end = _take_word(code, start, line_pos, char_pos)
+    special_line_pos = line_pos
+    line_start += 1  # '#' is not counted in character positions on this line
     value = ""
-    if code and code[0] == "(":
-        del code[0]
-        char_pos += 1
+    if code.startswith("(", end):
         brackets = 0
-        while code:
-            c = code.pop(0)
+        value_start = end + 1
+        end = len(code)
+        value_end = end
+        for m in _PARENTHESES.finditer(code, value_start):
+            c = m.group()
             if c == "\n":
+                # newline itself is counted as the first character of next line
                 line_pos += 1
-                char_pos = 0
-            char_pos += 1
-            if c == "(":
+                line_start = m.start()
+            elif c == "(":
                 brackets += 1
-            elif c == ")" and brackets == 0:
-                break
-            elif c == ")":
+            elif brackets:
                 brackets -= 1
-            value += c
-    return Special(name.word, value, start_line_pos, start_char_pos), line_pos, char_pos
+            else:
+                value_end = m.start()
+                end = value_end + 1
+                break
+        value = code[value_start:value_end]
+    return (
+        Special(name.word, value, special_line_pos, char_pos),
+        end,
+        line_pos,
+        line_start,
+    )
 
 
 def tokenize(code: str) -> list[Token]:
     """Take RainDuck code and return list of tokens."""
-    code_list = list(code)
-    char_pos = 0
     line_pos = 1
+    line_start = 0  # index of the first character on current line
     result: list[Token] = []
-    while code_list:
-        char_pos += 1
-        char = code_list.pop(0)
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+        char_pos = i - line_start + 1
         if char == "\n":
-            char_pos = 0
             line_pos += 1
+            line_start = i + 1
+            i += 1
         elif char == "#":
-            special, line_pos, char_pos = _take_special(code_list, line_pos, char_pos)
+            special, i, line_pos, line_start = _take_special(
+                code, i + 1, line_pos, char_pos, line_start
+            )
             result.append(special)
         elif char.isalpha() or char == "_":
-            word, char_pos = _take_word(char, code_list, line_pos, char_pos)
+            word, i = _take_word(code, i, line_pos, char_pos)
             result.append(word)
-        elif char.isdecimal() or (
-            char == "-" and code_list and code_list[0].isdecimal()
-        ):
-            (
-                num,
-                char_pos,
-            ) = _take_num(char, code_list, line_pos, char_pos)
+        elif char.isdecimal() or (char == "-" and code[i + 1 : i + 2].isdecimal()):
+            num, i = _take_num(code, i, line_pos, char_pos)
             result.append(num)
-        elif char == "/" and code_list and code_list[0] == "/":
-            if "\n" in code_list:
-                del code_list[: code_list.index("\n")]
-            else:
-                code_list.clear()
-        elif not char.isspace():
-            result.append(Char(char, line_pos, char_pos))
+        elif char == "/" and code.startswith("/", i + 1):
+            i = code.find("\n", i)
+            if i < 0:
+                i = length
+        else:
+            if not char.isspace():
+                result.append(Char(char, line_pos, char_pos))
+            i += 1
     return result
+
+
+class TokenArray:
+    """
+    Tokens of RainDuck code shared by the whole parsing with precomputed
+    positions of matching brackets, so code elements can be taken by moving
+    an index instead of copying bracketed parts of the code.
+    """
+
+    tokens: list[Token]
+    pairs: list[int]  # index of matching '}' or ']' for '{' and '[', else -1
+
+    def __init__(self, tokens: list[Token]) -> None:
+        self.tokens = tokens
+        self.pairs = [-1] * len(tokens)
+        opened: dict[str, list[int]] = {"{": [], "[": []}
+        for i, token in enumerate(tokens):
+            match token:
+                case Char("{" | "[" as c):
+                    opened[c].append(i)
+                case Char("}") if opened["{"]:
+                    self.pairs[opened["{"].pop()] = i
+                case Char("]") if opened["["]:
+                    self.pairs[opened["["].pop()] = i
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def closing(self, pos: int, end: int) -> int | None:
+        """
+        Return index of bracket matching the one on index pos, if it is
+        before end.
+        """
+        close = self.pairs[pos]
+        return close if 0 <= close < end else None
@@ -1,22 +1,179 @@
 from pathlib import Path
+from typing import Iterator, TextIO, cast
 
-from rainduck.code_elements import CodeBlock
+from rainduck import optimizer
+from rainduck.code_elements import BrainFuck, CodeBlock, Limits, resolve
 from rainduck.errors import RainDuckSyntaxError
-from rainduck.tokens import tokenize
+from rainduck.stats import Stats
+from rainduck.tokens import TokenArray, tokenize
 
 
-def parse(code: str, file_path: Path | None = None) -> CodeBlock:
-    tokens = tokenize("{" + code + "}")
-    block = CodeBlock.take(tokens, file_path=file_path)
-    if tokens:
-        t = tokens[0]
-        raise RainDuckSyntaxError(line_pos=t.line_pos, char_pos=t.char_pos)
-    if block is None:
+def parse(
+    code: str, file_path: Path | None = None, stats: Stats | None = None
+) -> CodeBlock:
+    if not (stats is None):
+        stats.start("tokenize")
+    tokens = TokenArray(tokenize("{" + code + "}"))
+    if not (stats is None):
+        stats.count("tokenize", len(tokens))
+        stats.start("parse")
+    taken = CodeBlock.take_at(tokens, 0, len(tokens), file_path=file_path)
+    if taken is None:
         raise RainDuckSyntaxError
+    block, pos = cast(tuple[CodeBlock, int], taken)
+    if pos < len(tokens):
+        t = tokens.tokens[pos]
+        raise RainDuckSyntaxError(line_pos=t.line_pos, char_pos=t.char_pos)
+    if stats is None:
+        resolve(block)
+    else:
+        stats.count("parse", resolve(block))
     return block
 
 
-def transpile(code: str, file_path: Path | None = None) -> str:
-    block = parse(code, file_path)
-    bf = block.transpile()
-    return "".join(str(x) for x in bf)
+def transpile_elements(
+    code: str,
+    file_path: Path | None = None,
+    optimize: int = 0,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> list[BrainFuck]:
+    """Transpile RainDuck code to list of (optionally optimized) BrainFuck runs."""
+    block = parse(code, file_path, stats)
+    if not (stats is None):
+        stats.start("transpile")
+    return optimizer.optimize(block.transpile(limits=limits), optimize)
+
+
+def transpile_chunks(
+    code: str,
+    file_path: Path | None = None,
+    optimize: int = 0,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> Iterator[str]:
+    """
+    Transpile RainDuck code and yield resulting BrainFuck code in chunks.
+    If optimize level is given, code is optimized by optimizer.optimize.
+    Time spent by consumer of chunks is recorded to transpile phase of stats.
+    If limits are given, RainDuckLimitError is raised when they are exceeded.
+    """
+    chunks: Iterator[str]
+    if optimize:
+        optimized = transpile_elements(code, file_path, optimize, stats, limits)
+        chunks = (chunk for elem in optimized for chunk in elem.emit())
+    else:
+        block = parse(code, file_path, stats)
+        if stats is None:
+            return block.emit(limits=limits)
+        stats.start("transpile")
+        chunks = block.emit(limits=limits)
+    return chunks if stats is None else _counted(chunks, stats)
+
+
+def _counted(chunks: Iterator[str], stats: Stats) -> Iterator[str]:
+    for chunk in chunks:
+        stats.count("transpile", 1)
+        yield chunk
+
+
+def transpile(
+    code: str,
+    file_path: Path | None = None,
+    optimize: int = 0,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> str:
+    """
+    Transpile RainDuck code to BrainFuck code. If stats are given, phases of
+    transpilation are recorded to them. If limits are given,
+    RainDuckLimitError is raised when they are exceeded.
+    """
+    if stats is None:
+        return "".join(transpile_chunks(code, file_path, optimize, limits=limits))
+    try:
+        chunks = list(transpile_chunks(code, file_path, optimize, stats, limits))
+        stats.start("write")
+        result = "".join(chunks)
+        stats.count("write", len(result))
+    finally:
+        stats.start(None)
+    return result
+
+
+def size(
+    code: str,
+    file_path: Path | None = None,
+    inverse: bool = False,
+    limits: Limits | None = None,
+) -> int:
+    """
+    Length of (unoptimized) BrainFuck code RainDuck code transpiles to (or its
+    inverse transpiles to), computed without emitting it in time proportional
+    to number of distinct macro expansions. Errors are raised as by transpile,
+    so inversion errors are raised for code which can't be inverted. Limits
+    of depth and time apply.
+    """
+    return parse(code, file_path).size(inverse, limits=limits)
+
+
+def transpile_to(
+    code: str,
+    file: TextIO,
+    file_path: Path | None = None,
+    optimize: int = 0,
+    buffer_size: int = 1 << 16,
+    stats: Stats | None = None,
+    limits: Limits | None = None,
+) -> None:
+    """
+    Transpile RainDuck code and write BrainFuck code to file as it is emitted,
+    buffering at most about buffer_size characters at once. If stats are
+    given, phases of transpilation are recorded to them. If limits are given,
+    RainDuckLimitError is raised when they are exceeded.
+    """
+    if not (stats is None):
+        try:
+            _transpile_to(code, file, file_path, optimize, buffer_size, stats, limits)
+        finally:
+            stats.start(None)
+        return
+    buffer: list[str] = []
+    buffered = 0
+    for chunk in transpile_chunks(code, file_path, optimize, limits=limits):
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            file.write("".join(buffer))
+            buffer.clear()
+            buffered = 0
+    file.write("".join(buffer))
+
+
+def _transpile_to(
+    code: str,
+    file: TextIO,
+    file_path: Path | None,
+    optimize: int,
+    buffer_size: int,
+    stats: Stats,
+    limits: Limits | None,
+) -> None:
+    """transpile_to recording stats, writing is recorded as write phase."""
+    buffer: list[str] = []
+    buffered = 0
+    for chunk in transpile_chunks(code, file_path, optimize, stats, limits):
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            _write(file, "".join(buffer), stats)
+            buffer.clear()
+            buffered = 0
+    _write(file, "".join(buffer), stats)
+
+
+def _write(file: TextIO, code: str, stats: Stats) -> None:
+    stats.start("write")
+    file.write(code)
+    stats.count("write", len(code))
+    stats.start("transpile")
@@ -0,0 +1,73 @@
+"""Transpilation of files again whenever they or files they import change."""
+
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+from rainduck import build
+from rainduck.code_elements import file_key
+
+
+class Watcher:
+    """
+    Keeps modification times and sizes of watched files and files they
+    import. Parsed imported files stay in memory (in import cache of
+    code_elements), so transpiling a changed file parses only that file.
+    """
+
+    patterns: list[str]
+    optimize: int
+    inputs: dict[str, dict[Path, tuple[int, int] | None]]
+    failed: set[str]
+
+    def __init__(self, patterns: Iterable[str], optimize: int = 0) -> None:
+        self.patterns = list(patterns)
+        self.optimize = optimize
+        self.inputs = {}
+        self.failed = set()
+
+    def _changed(self, source: str) -> bool:
+        inputs = self.inputs.get(source)
+        return inputs is None or any(file_key(p) != k for p, k in inputs.items())
+
+    def poll(self) -> list[tuple[str, str | None, float]]:
+        """
+        Transpile new and changed files and return them with error messages
+        (None if transpiled) and seconds it took. Files which failed are transpiled again when any
+        file changes, as they may import file which did not exist.
+        """
+        sources = build.sources(self.patterns)
+        for removed in self.inputs.keys() - set(sources):
+            del self.inputs[removed]
+            self.failed.discard(removed)
+        changed = [s for s in sources if self._changed(s)]
+        if changed:
+            changed += [s for s in sources if s in self.failed and s not in changed]
+        results = []
+        for source in changed:
+            start = time.perf_counter()
+            source_path = Path(source).resolve()
+            source_key = file_key(source_path)
+            error, imported = build.transpile_recorded(source, self.optimize)
+            self.inputs[source] = {source_path: source_key, **imported}
+            if error is None:
+                self.failed.discard(source)
+            else:
+                self.failed.add(source)
+            results.append((source, error, time.perf_counter() - start))
+        return results
+
+
+def watch(
+    watcher: Watcher,
+    report: Callable[[str, str | None, float], None],
+    interval: float = 0.2,
+) -> None:
+    """
+    Poll watcher every interval seconds forever, reporting every transpiled
+    file with error message and time it took.
+    """
+    while True:
+        for source, error, seconds in watcher.poll():
+            report(source, error, seconds)
+        time.sleep(interval)
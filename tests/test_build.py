@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from rainduck import build
+
+
+def test_sources(tmp_path):
+    (tmp_path / "lib").mkdir()
+    for name in ["a.rd", "b.txt", "lib/c.rd", "lib/d.rd"]:
+        (tmp_path / name).write_text("+")
+    assert build.sources([str(tmp_path / "lib"), str(tmp_path / "*.rd")]) == [
+        str(tmp_path / "lib" / "c.rd"),
+        str(tmp_path / "lib" / "d.rd"),
+        str(tmp_path / "a.rd"),
+    ]
+    assert build.sources([str(tmp_path / "b.txt"), str(tmp_path / "a.rd")]) == [
+        str(tmp_path / "b.txt"),
+        str(tmp_path / "a.rd"),
+    ]
+    assert build.output_path("x/a.rd") == "x/a.bf"
+    assert build.output_path("b.txt") == "b.txt.bf"
+
+
+def test_build(tmp_path):
+    """Test if files are transpiled in processes and errors reported per file."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    files = []
+    for i in range(10):
+        files.append(str(tmp_path / f"{i}.rd"))
+        code = f"let #import(lib.rd) in {i}{{+r}}" if i != 3 else "-1[-]"
+        (tmp_path / f"{i}.rd").write_text(code)
+    results = dict(build.build(files, jobs=2))
+    assert [f for f, error in results.items() if error] == [files[3]]
+    assert "InversionError" in results[files[3]]
+    assert (tmp_path / "5.bf").read_text() == 5 * "+>"
+    assert not (tmp_path / "3.bf").exists()
+
+
+def test_incremental_build(tmp_path):
+    """Test if only files with changed sources or imports are transpiled."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "sub.rd").write_text("let #import(lib.rd) in")
+    (tmp_path / "a.rd").write_text("let #import(sub.rd) in r")
+    (tmp_path / "b.rd").write_text("let #import(lib.rd) in r")
+    (tmp_path / "c.rd").write_text("+")
+    files = [str(tmp_path / f"{name}.rd") for name in "abc"]
+
+    def rebuild(**options):
+        manifest = build.Manifest(tmp_path / "manifest.json")
+        return [f[-4:] for f, _ in build.build(files, manifest=manifest, **options)]
+
+    assert rebuild() == ["a.rd", "b.rd", "c.rd"]
+    assert rebuild() == []
+    (tmp_path / "lib.rd").write_text("let r = {>>} in")
+    assert rebuild() == ["a.rd", "b.rd"]
+    assert (tmp_path / "a.bf").read_text() == ">>"
+    (tmp_path / "c.rd").write_text("-1[]")
+    assert rebuild() == ["c.rd"]
+    assert rebuild() == ["c.rd"]
+    assert rebuild(optimize=1) == ["a.rd", "b.rd", "c.rd"]
+    (tmp_path / "b.bf").unlink()
+    assert rebuild(optimize=1) == ["b.rd", "c.rd"]
+    assert rebuild(optimize=1, force=True) == ["a.rd", "b.rd", "c.rd"]
+
+
+def test_build_in_threaded_host(tmp_path):
+    """Test if workers aren't forked while other threads of host run."""
+    import threading
+    import warnings
+
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    files = [str(tmp_path / f"{i}.rd") for i in range(2)]
+    for path in files:
+        Path(path).write_text("+")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            assert dict(build.build(files, jobs=2)) == dict.fromkeys(files)
+    finally:
+        stop.set()
+        thread.join()
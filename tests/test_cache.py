@@ -0,0 +1,70 @@
+import pytest
+
+from rainduck import cache, code_elements
+from rainduck.transpiler import transpile
+
+
+@pytest.fixture
+def parsed(tmp_path, monkeypatch):
+    """Use cache in temporary directory and collect paths of parsed imports."""
+    monkeypatch.setattr(cache, "directory", tmp_path / "cache")
+    parsed = []
+    parse_import = code_elements._parse_import
+
+    def counting(path, *args):
+        parsed.append(path.name)
+        return parse_import(path, *args)
+
+    monkeypatch.setattr(code_elements, "_parse_import", counting)
+    code_elements.clear_import_cache()
+    yield parsed
+    code_elements.clear_import_cache()
+
+
+def test_cache(tmp_path, parsed):
+    """Test if unchanged imports are loaded from cache in new process."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "a.rd").write_text("let #import(lib.rd) ra = {r +} in")
+    main = tmp_path / "main.rd"
+    code = "let #import(a.rd) #import(lib.rd) in ra r"
+    assert transpile(code, main) == ">+>"
+    assert sorted(parsed) == ["a.rd", "lib.rd"]
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+    code_elements.clear_import_cache()
+    assert transpile(code, main) == ">+>"
+    assert len(parsed) == 2
+
+
+def test_cache_invalidation(tmp_path, parsed, monkeypatch):
+    """Test if entries are not used when imported files or version change."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "a.rd").write_text("let #import(lib.rd) ra = {r +} in")
+    main = tmp_path / "main.rd"
+    assert transpile("let #import(a.rd) in ra", main) == ">+"
+    (tmp_path / "lib.rd").write_text("let r = {<} in")
+    code_elements.clear_import_cache()
+    assert transpile("let #import(a.rd) in ra", main) == "<+"
+    assert parsed == ["a.rd", "lib.rd", "a.rd", "lib.rd"]
+    monkeypatch.setattr(cache, "version", lambda: "other")
+    code_elements.clear_import_cache()
+    assert transpile("let #import(a.rd) in ra", main) == "<+"
+    assert len(parsed) == 6
+    for entry in (tmp_path / "cache").iterdir():
+        entry.write_bytes(b"broken")
+    code_elements.clear_import_cache()
+    assert transpile("let #import(a.rd) in ra", main) == "<+"
+    assert len(parsed) == 8
+
+
+def test_version(monkeypatch):
+    """Test if version of installed rainduck includes hash of its sources."""
+    import importlib.metadata
+
+    monkeypatch.setattr(importlib.metadata, "version", lambda name: "0.3.0")
+    cache.version.cache_clear()
+    try:
+        installed, _, sources = cache.version().partition("-")
+    finally:
+        cache.version.cache_clear()
+    assert installed == "0.3.0"
+    assert len(sources) == 64
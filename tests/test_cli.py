@@ -0,0 +1,177 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from rainduck import cache, code_elements
+from rainduck.cli import app
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(monkeypatch):
+    """Restore cache directory set by commands."""
+    monkeypatch.setattr(cache, "directory", None)
+
+
+def test_transpile_file(tmp_path):
+    """Test if transpiled code is written next to source and existing output
+    is kept when transpilation fails.
+    """
+    source = tmp_path / "program.rd"
+    source.write_text("let r = {>} in 3{+r}")
+    result = runner.invoke(app, [str(source)])
+    assert result.exit_code == 0
+    assert (tmp_path / "program.bf").read_text() == "+>+>+>"
+    source.write_text("+ -1[-]")
+    result = runner.invoke(app, [str(source)])
+    assert result.exit_code == 1
+    assert (tmp_path / "program.bf").read_text() == "+>+>+>"
+    assert {p.name for p in tmp_path.iterdir()} == {"program.rd", "program.bf"}
+
+
+def test_transpile_stdout(tmp_path):
+    """Test if transpiled code is streamed to standard output."""
+    source = tmp_path / "program.rd"
+    source.write_text("1000{+}")
+    result = runner.invoke(app, [str(source), "--output", "-"])
+    assert result.exit_code == 0
+    assert result.stdout == 1000 * "+"
+
+
+def test_transpile_stats(tmp_path):
+    """Test if stats of phases are printed as JSON to standard error."""
+    source = tmp_path / "program.rd"
+    source.write_text("10{+}")
+    args = [str(source), "--output", "-", "--stats", "--stats-format", "json"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert result.stdout == 10 * "+"
+    phases = json.loads(result.stderr)
+    assert phases[-1] == phases[-1] | {"name": "write", "count": 10}
+    result = runner.invoke(app, [*args, "--source-map", str(tmp_path / "map.json")])
+    assert result.exit_code == 0
+    assert result.stdout == 10 * "+"
+    phases = {phase["name"]: phase for phase in json.loads(result.stderr)}
+    assert phases["parse"]["count"] > 0 and phases["transpile"]["count"] > 0
+    assert phases["write"]["count"] == 10
+
+
+def test_profile(tmp_path):
+    """Test if macro profiles are printed and collapsed stacks written."""
+    source = tmp_path / "program.rd"
+    source.write_text("let r = {>} in 3{r +}")
+    collapsed = tmp_path / "program.folded"
+    result = runner.invoke(app, ["profile", str(source), "--collapsed", str(collapsed)])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines()[2].split()[:3] == ["3", "3", "3"]
+    assert collapsed.read_text() == "program.rd 3\nprogram.rd;r 3\n"
+
+
+def test_run(tmp_path):
+    """Test if code is transpiled and run with given input."""
+    source = tmp_path / "program.rd"
+    source.write_text("let copy = {[->+<]} in ,copy>+.")
+    result = runner.invoke(app, ["run", str(source)], input="A")
+    assert result.exit_code == 0
+    assert result.stdout == "B"
+    result = runner.invoke(app, ["run", str(source), "--tape-size", "1"], input="A")
+    assert result.exit_code == 1
+    result = runner.invoke(app, ["run", str(source), "--backend", "python"], input="A")
+    assert result.exit_code == 0
+    assert result.stdout == "B"
+
+
+def test_cache_options(tmp_path):
+    """Test if parsed imports are cached in given directory unless disabled."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    source = tmp_path / "program.rd"
+    source.write_text("let #import(lib.rd) in r")
+    cache_dir = tmp_path / "cache"
+    args = [str(source), "--output", "-", "--cache-dir", str(cache_dir)]
+    result = runner.invoke(app, [*args, "--no-cache"])
+    assert result.stdout == ">"
+    assert not cache_dir.exists()
+    code_elements.clear_import_cache()
+    result = runner.invoke(app, args)
+    assert result.stdout == ">"
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_build(tmp_path):
+    """Test if all files are transpiled and failure of one is reported."""
+    (tmp_path / "a.rd").write_text("+")
+    (tmp_path / "b.rd").write_text("-1[-]")
+    (tmp_path / "c.rd").write_text("-")
+    manifest = ["--manifest", str(tmp_path / "manifest.json")]
+    result = runner.invoke(app, ["build", str(tmp_path), "--jobs", "2", *manifest])
+    assert result.exit_code == 1
+    assert "b.rd" in result.stderr
+    assert "Transpiled 2 of 3 files (0 up to date)." in result.stderr
+    assert (tmp_path / "c.bf").read_text() == "-"
+    (tmp_path / "b.rd").write_text("[-]")
+    result = runner.invoke(app, ["build", str(tmp_path / "*.rd"), "-j1", *manifest])
+    assert result.exit_code == 0
+    assert "Transpiled 1 of 3 files (2 up to date)." in result.stderr
+    assert (tmp_path / "b.bf").read_text() == "[-]"
+    result = runner.invoke(app, ["build", str(tmp_path), *manifest, "--force"])
+    assert "Transpiled 3 of 3 files (0 up to date)." in result.stderr
+    limits = ["--max-instructions", "1", "--max-depth", "10", "--timeout", "5"]
+    (tmp_path / "a.rd").write_text("2+")
+    result = runner.invoke(app, ["build", str(tmp_path), *manifest, *limits])
+    assert result.exit_code == 1
+    assert "LimitError" in result.stderr and "a.rd" in result.stderr
+
+
+def test_source_map_and_hotspots(tmp_path):
+    """Test if source map is written and hot spots printed to standard error."""
+    source = tmp_path / "program.rd"
+    source.write_text("let c = {[-<]} in\n>>+++\nc")
+    source_map = tmp_path / "program.map"
+    args = [str(source), "--output", "-", "--source-map", str(source_map)]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert result.stdout == ">>+++[-<]"
+    assert json.loads(source_map.read_text())["length"] == 9
+    result = runner.invoke(app, args + ["--optimize", "1"])
+    assert result.exit_code == 2
+    result = runner.invoke(app, ["run", str(source), "--hotspots"])
+    assert result.exit_code == 0
+    assert result.stderr.splitlines()[1].split() == ["4", f"{source}:1"]
+
+
+def test_size(tmp_path):
+    """Test if size is printed and inversion error reported."""
+    source = tmp_path / "program.rd"
+    source.write_text("let c = {[-]} in 1000000000{c >}")
+    result = runner.invoke(app, ["size", str(source)])
+    assert result.exit_code == 0
+    assert result.stdout == "4000000000\n"
+    result = runner.invoke(app, ["size", str(source), "--inverse"])
+    assert result.exit_code == 1
+    assert "InversionError" in result.stderr
+
+
+def test_infinite_recursion(tmp_path):
+    """Test if macros containing themselves are reported as errors."""
+    source = tmp_path / "program.rd"
+    for code in ["let a = {+a} in a", "let f(x) = {f({x x})} in f(+)"]:
+        source.write_text(code)
+        result = runner.invoke(app, [str(source), "--output", "-"])
+        assert result.exit_code == 1
+        assert "Error" in result.stderr
+        result = runner.invoke(app, ["size", str(source)])
+        assert result.exit_code == 1
+
+
+def test_max_depth(tmp_path):
+    """Test if --max-depth limits all expansions and 0 turns limits off."""
+    source = tmp_path / "program.rd"
+    source.write_text("let r = {>} in [[r]]")
+    result = runner.invoke(app, [str(source), "--output", "-", "--max-depth", "3"])
+    assert result.exit_code == 1
+    assert "nested deeper than 3" in result.stderr
+    result = runner.invoke(app, [str(source), "--output", "-", "--max-depth", "0"])
+    assert result.exit_code == 0
+    assert result.stdout == "[[>]]"
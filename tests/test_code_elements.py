@@ -4,10 +4,14 @@ from rainduck.code_elements import (
     BrainFuckLoop,
     BrainFuckOperation,
     CodeBlock,
+    MacroCall,
     Multiplication,
     code_elements,
+    resolve,
 )
-from rainduck.tokens import Char, Number, Word, tokenize
+from rainduck.errors import RainDuckNameError, RainDuckSyntaxError
+from rainduck.tokens import Char, Number, TokenArray, Word, tokenize
+from rainduck.transpiler import parse
 
 
 @pytest.mark.parametrize(
@@ -44,3 +48,57 @@ def test_take(code, element, rest):
         tokenized3 = list(tokenized2)
         assert elem.take(tokenized3) is None
         assert tokenized2 == tokenized3
+
+
+def test_take_at():
+    """Test if elements are taken from shared token array only up to end index
+    and matching brackets outside of that range are ignored.
+    """
+    tokens = TokenArray(tokenize("[{+[-]}]+] [<"))
+    loop, pos = BrainFuckLoop.take_at(tokens, 0, len(tokens))
+    assert pos == 8
+    assert str(loop.code[0].code[1]) == "[-]"
+    with pytest.raises(RainDuckSyntaxError) as e:
+        BrainFuckLoop.take_at(tokens, 3, 5)
+    assert e.value.message == "Missing ']'"
+    with pytest.raises(RainDuckSyntaxError):
+        BrainFuckLoop.take_at(tokens, 10, len(tokens))
+
+
+def test_transpile_runs():
+    """Test if runs of the same operation are transpiled to one
+    BrainFuckOperation with count.
+    """
+    elements = parse("1000{+} -3{+} [<<[]] 2{>>>} >").transpile()
+    assert [(type(x), str(x)) for x in elements] == [
+        (BrainFuckOperation, 1000 * "+"),
+        (BrainFuckOperation, "---"),
+        (BrainFuckLoop, "[<<[]]"),
+        (BrainFuckOperation, ">>>>>>>"),
+    ]
+    assert elements[0].count == 1000
+    assert elements[2].code[0].count == 2
+
+
+def test_resolve():
+    """Test if macro calls are bound to macros or arguments after parsing."""
+    block = parse("let r = {>} f(x; r) = {x r} in f(r)")
+    call = block.code[0]
+    assert isinstance(call, MacroCall)
+    assert call.target is block.macros["f"]
+    assert call.args[0].target is block.macros["r"]
+    body = block.macros["f"].code
+    assert [(c.target, c.index) for c in body.code] == [(body, 0), (body, 1)]
+    block = parse("let f(x) = {let g(y) = {x y} in g(+)} in f(-)")
+    g_body = block.macros["f"].code.macros["g"].code
+    assert [(c.name, c.hops) for c in g_body.code] == [("x", 1), ("y", 0)]
+    assert "".join(block.emit()) == "-+"
+    with pytest.raises(RainDuckNameError) as e:
+        parse("let f = {0{+ g}} in -2[]")
+    assert (e.value.traceback[0].line_pos, e.value.traceback[0].char_pos) == (1, 15)
+    block = CodeBlock.take(tokenize("{let r = {>} in r}"))
+    with pytest.raises(RainDuckNameError):  # emitting doesn't modify the tree
+        "".join(block.emit())
+    assert block.code[0].target is None
+    resolve(block)
+    assert "".join(block.emit()) == ">"
@@ -0,0 +1,49 @@
+import io
+import random
+import sys
+
+import pytest
+
+from rainduck import compiler
+from rainduck.errors import RainDuckRuntimeError
+from rainduck.transpiler import parse, transpile_chunks
+from tests.test_interpreter import execute
+from tests.test_optimizer import random_program
+from tests.test_optimizer import run as reference_run
+
+
+def execute_compiled(code: str, input: bytes = b"", **options) -> bytes:
+    output = io.BytesIO()
+    program = compiler.compile_program(parse(code).transpile())
+    compiler.run(program, io.BytesIO(input), output, **options)
+    return output.getvalue()
+
+
+def test_compiled_same_as_interpreted():
+    """Test if compiled random programs give the same output as interpreted."""
+    rng = random.Random(2)
+    for _ in range(200):
+        code = "100> " + random_program(rng)
+        if reference_run("".join(transpile_chunks(code))) is None:
+            continue
+        expected = execute(code, 100 * b"\x07")
+        assert execute_compiled(code, 100 * b"\x07") == expected, code
+
+
+def test_compile_deeply_nested():
+    code = "+" + 50 * "[>+" + "." + 50 * "<-]" + 50 * ">" + "."
+    assert execute_compiled(code) == execute(code) == b"\x01\x01"
+    assert execute_compiled(",.", eof=compiler.EOF.MINUS_ONE, cell_bits=16) == b"\xff"
+    assert execute_compiled(",.", eof=compiler.EOF.MINUS_ONE, cell_bits=32) == b"\xff"
+    code = "20000> - [[-] 20000< + 20000>] 20000< 256{+} [[-] > + <] > ."
+    assert execute_compiled(code, cell_bits=32, tape_size=30000) == b"\x01"
+    with pytest.raises(RainDuckRuntimeError):
+        execute_compiled("+[<+]")
+    depth = 3 * sys.getrecursionlimit()  # not limited by recursion limit
+    code = "+" + depth * "[>+" + "." + depth * "<-]"
+    assert execute_compiled(code) == b"\x01"
+
+
+def test_compile_cache():
+    code = parse("3{+>}[-]").transpile()
+    assert compiler.compile_program(code) is compiler.compile_program(list(code))
@@ -0,0 +1,105 @@
+import io
+import random
+
+import pytest
+
+from rainduck import interpreter
+from rainduck.errors import RainDuckRuntimeError, RainDuckSyntaxError
+from rainduck.transpiler import transpile_chunks
+from tests.test_optimizer import random_program
+from tests.test_optimizer import run as reference_run
+
+
+def execute(code: str, input: bytes = b"", **options) -> bytes:
+    output = io.BytesIO()
+    program = interpreter.Program(transpile_chunks(code))
+    interpreter.run(program, io.BytesIO(input), output, **options)
+    return output.getvalue()
+
+
+def test_program():
+    """Test if runs are folded and clear, move and copy loops recognized."""
+    program = interpreter.Program(["++-+[-]>>", "><[->+>++<<]<[+]>[>,]."])
+    assert program.ops == [
+        interpreter._ADD,
+        interpreter._CLEAR,
+        interpreter._MOVE,
+        interpreter._MULTIPLY,
+        interpreter._MOVE,
+        interpreter._CLEAR,
+        interpreter._MOVE,
+        interpreter._JUMP_ZERO,
+        interpreter._MOVE,
+        interpreter._INPUT,
+        interpreter._JUMP_NONZERO,
+        interpreter._OUTPUT,
+    ]
+    assert program.args[:4] == [2, None, 2, ([(1, 1), (2, 2)], 1, 2, -1)]
+    with pytest.raises(RainDuckSyntaxError):
+        interpreter.Program(["[[]"])
+
+
+def test_run_options():
+    assert execute(",.", eof=interpreter.EOF.MINUS_ONE) == b"\xff"
+    assert execute("+,.", eof=interpreter.EOF.KEEP) == b"\x01"
+    assert execute(",+.", b"A") == b"B"
+    code = "256{+} [[-] > + <] > ."
+    assert execute(code) == b"\x00"
+    assert execute(code, cell_bits=16) == b"\x01"
+    with pytest.raises(RainDuckRuntimeError):
+        execute(">>>", tape_size=3)
+
+
+def test_wide_cells():
+    """Test if tapes of wide cells have requested number of cells."""
+    for cell_bits in (8, 16, 32, 64):
+        assert len(interpreter.make_tape(30000, cell_bits)) == 30000
+        assert list(interpreter.make_tape(3, cell_bits)) == [0, 0, 0]
+    code = "256{+} [[-] > + <] > ."
+    assert execute(code, cell_bits=32) == b"\x01"
+    code = "20000> - [[-] 20000< + 20000>] 20000< ."
+    assert execute(code, cell_bits=32, tape_size=30000) == b"\x01"
+    assert execute(",.", eof=interpreter.EOF.MINUS_ONE, cell_bits=32) == b"\xff"
+
+
+def test_run_same_as_reference():
+    """Test if random programs give the same output as simple interpreter."""
+    rng = random.Random(1)
+    for _ in range(200):
+        code = "100> " + random_program(rng)
+        expected = reference_run("".join(transpile_chunks(code)))
+        if expected is None:
+            continue
+        assert execute(code, 100 * b"\x07") == expected[2].encode("latin-1"), code
+
+
+def test_counted_program():
+    """Test if counted program gives the same output and counts executions of
+    instructions at their offsets."""
+    code = "++[->+++[-]<]>[->[-]+<]+."
+    program = interpreter.Program([code[:5], code[5:]], counted=True)
+    output = io.BytesIO()
+    interpreter.run(program, io.BytesIO(), output)
+    assert output.getvalue() == b"\x01"
+    executions = dict(program.executions())
+    assert [executions[i] for i in (0, 2, 3, 8, 12, 13, 14, 24)] == [
+        1,
+        1,
+        2,
+        2,
+        2,
+        1,
+        1,
+        1,
+    ]
+    assert set(executions) <= {i for i, c in enumerate(code)}
+    rng = random.Random(2)
+    for _ in range(100):
+        code = "".join(transpile_chunks("100> " + random_program(rng)))
+        expected = reference_run(code)
+        if expected is None:
+            continue
+        output = io.BytesIO()
+        program = interpreter.Program([code], counted=True)
+        interpreter.run(program, io.BytesIO(100 * b"\x07"), output)
+        assert output.getvalue() == expected[2].encode("latin-1"), code
@@ -0,0 +1,84 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from rainduck.transpiler import transpile
+
+
+def run(code: str, max_steps: int = 10_000) -> tuple[dict[int, int], int, str] | None:
+    """Simple BrainFuck interpreter returning final tape, pointer and output,
+    or None if program doesn't finish in max_steps.
+    """
+    jumps: dict[int, int] = {}
+    opened = []
+    for i, c in enumerate(code):
+        if c == "[":
+            opened.append(i)
+        elif c == "]":
+            j = opened.pop()
+            jumps[i], jumps[j] = j, i
+    tape: defaultdict[int, int] = defaultdict(int)
+    ptr = i = steps = 0
+    output = ""
+    while i < len(code):
+        steps += 1
+        if steps > max_steps:
+            return None
+        match code[i]:
+            case "+" | "-" as c:
+                tape[ptr] = (tape[ptr] + (1 if c == "+" else -1)) % 256
+            case "<":
+                ptr -= 1
+            case ">":
+                ptr += 1
+            case ".":
+                output += chr(tape[ptr])
+            case ",":
+                tape[ptr] = 7
+            case "[" if not tape[ptr]:
+                i = jumps[i]
+            case "]" if tape[ptr]:
+                i = jumps[i]
+        i += 1
+    return {k: v for k, v in tape.items() if v}, ptr, output
+
+
+@pytest.mark.parametrize(
+    ("code", "level", "optimized"),
+    [
+        ("+>><<-", 1, ""),
+        ("3{+>} -2{+>} [-]", 1, "+>[-]"),
+        ("[-]>[-]", 1, ">"),
+        ("+[-]>[->+<][+]+", 1, "+[-]>[->+<]+"),
+        ("+[-][.]>[+]", 1, "+[-]>[+]"),
+        ("+[-][.]>[+]", 2, "+[-]>[-]"),
+        ("let m = {<+>} in m -1m ,[<>-]", 1, ",[-]"),
+    ],
+)
+def test_optimize(code, level, optimized):
+    assert transpile(code, optimize=level) == optimized
+
+
+def random_program(rng: random.Random, depth: int = 0) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        if depth < 3 and rng.random() < 0.2:
+            parts.append("[" + random_program(rng, depth + 1) + "]")
+        else:
+            parts.append(str(rng.randint(-3, 3)) + rng.choice("+-<>.,"))
+    return " ".join(parts)
+
+
+def test_optimized_behaves_same():
+    """Test if optimized random programs have the same output and leave the same
+    tape.
+    """
+    rng = random.Random(0)
+    for _ in range(200):
+        code = random_program(rng)
+        expected = run(transpile(code))
+        if expected is None:
+            continue
+        for level in (1, 2):
+            assert run(transpile(code, optimize=level)) == expected, code
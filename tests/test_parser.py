@@ -18,3 +18,16 @@ def test_tokenization():
         tokens.Word("_b", 2, 16),
         tokens.Char("}", 2, 18),
     ]
+
+
+def test_tokenization_special_and_comments():
+    """Test tokenization of special expressions, comments and tokens at the end
+    of code.
+    """
+    code = tokens.tokenize("#import(a(b).rd)\nx // c\n-1_0 end")
+    assert code == [
+        tokens.Special("import", "a(b).rd", 1, 1),
+        tokens.Word("x", 2, 1),
+        tokens.Number(-10, 3, 1),
+        tokens.Word("end", 3, 6),
+    ]
@@ -0,0 +1,42 @@
+from rainduck import code_elements
+from rainduck.profiler import Profiler
+from rainduck.transpiler import parse, transpile
+
+
+def profile(code: str, file_path=None) -> Profiler:
+    with Profiler() as profiler:
+        "".join(parse(code, file_path).emit())
+    return profiler
+
+
+def test_macro_profiles():
+    """Test if calls and instructions of macros are counted as if reused
+    expansions were expanded again."""
+    code = "let c = {[-]} m(x) = {x c} in 1000{m(>) +} 0{m(<)} m(<)"
+    macros = {p.name: p for p in profile(code).macros()}
+    assert list(macros) == ["main", "m", "c"]
+    assert (macros["main"].calls, macros["main"].instructions) == (1, 1000)
+    assert macros["main"].inclusive == len(transpile(code))
+    assert (macros["m"].calls, macros["m"].instructions) == (1001, 1001)
+    assert (macros["c"].calls, macros["c"].inclusive) == (1001, 3003)
+    assert code_elements._tracer is None
+
+
+def test_recursive_names_and_imports(tmp_path):
+    """Test if nested macros of the same name are included once and imported
+    macros are named by file."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    code = "let #import(lib.rd) f(x) = {x} in f(f({r f(+)}))"
+    macros = {p.name: p for p in profile(code, tmp_path / "main.rd").macros()}
+    assert (macros["f"].calls, macros["f"].inclusive) == (3, 2)
+    assert macros["lib.rd: r"].inclusive == 1
+
+
+def test_collapsed():
+    """Test if collapsed stacks add up to emitted instructions."""
+    code = "let d0 = {+} d1 = {d0 d0} d2 = {d1 -1d1 d1} in 3{d2} >"
+    profiler = profile(code)
+    assert sorted(profiler.collapsed().splitlines()) == [
+        "main 1",
+        "main;d2;d1;d0 18",
+    ]
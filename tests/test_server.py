@@ -0,0 +1,60 @@
+import io
+import json
+import socket
+import threading
+
+from rainduck import server
+
+
+def test_handle(tmp_path):
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "main.rd").write_text("let #import(lib.rd) in 2r")
+    assert server.handle({"id": 1, "code": "3+ -1+", "optimize": 1}) == {
+        "id": 1,
+        "ok": True,
+        "code": "++",
+    }
+    assert server.handle({"path": str(tmp_path / "main.rd")})["code"] == ">>"
+    file_path = str(tmp_path / "other.rd")
+    request = {"code": "let #import(lib.rd) in r", "file_path": file_path}
+    assert server.handle(request)["code"] == ">"
+    response = server.handle({"id": "x", "code": "let f = {-1[-]} in\n f"})
+    assert response == {
+        "id": "x",
+        "ok": False,
+        "error": {
+            "type": "InversionError",
+            "message": "Loop can't be inverted",
+            "traceback": [
+                {"line_pos": 1, "char_pos": 13, "macro_name": None},
+                {"line_pos": 2, "char_pos": 2, "macro_name": "f"},
+            ],
+        },
+    }
+    assert server.handle({"code": "+", "path": "x.rd"})["error"]["type"] == "Request"
+    assert server.handle([])["error"]["type"] == "Request"
+    missing = server.handle({"path": str(tmp_path / "missing.rd")})
+    assert missing["error"]["type"] == "FileNotFoundError"
+
+
+def test_serve_stream():
+    requests = '{"id": 1, "code": "2+"}\n\n{"id": 2, "code": "-"}\nnot json\n'
+    output = io.StringIO()
+    server.serve_stream(io.StringIO(requests), output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r.get("code") for r in responses] == ["++", "-", None]
+    assert responses[2]["error"]["type"] == "Request"
+
+
+def test_serve_socket(tmp_path):
+    path = str(tmp_path / "rainduck.sock")
+    thread = threading.Thread(target=server.serve_socket, args=(path,), daemon=True)
+    thread.start()
+    for _ in range(100):
+        if (tmp_path / "rainduck.sock").exists():
+            break
+        threading.Event().wait(0.01)
+    with socket.socket(socket.AF_UNIX) as client:
+        client.connect(path)
+        client.sendall(b'{"id": 1, "code": "3>"}\n')
+        assert json.loads(client.makefile().readline())["code"] == ">>>"
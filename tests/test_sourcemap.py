@@ -0,0 +1,45 @@
+import io
+
+from rainduck import code_elements, sourcemap
+from rainduck.sourcemap import Location, SourceMap
+from rainduck.transpiler import transpile
+
+
+def test_locations(tmp_path):
+    """Test if offsets are mapped to innermost macro calls and loops with
+    stacks of macros and files of imported macros."""
+    (tmp_path / "lib.rd").write_text("let\n  r = {>[+]}\nin")
+    main = tmp_path / "main.rd"
+    code = "let #import(lib.rd) f(x) = {x -} in\n+ f(r)\n2{<}"
+    result, source_map = sourcemap.transpile(code, main)
+    assert result == transpile(code, main) == "+>[+]-<<"
+    assert source_map.length == len(result)
+    assert code_elements._tracer is None
+    locations = [source_map.lookup(i) for i in range(len(result))]
+    assert locations[0] == Location(str(main), None, None, ())
+    assert locations[1] == Location(str(main), 2, 5, ("f", "lib.rd: r"))
+    lib = Location(str(tmp_path / "lib.rd"), 2, 9, ("f", "lib.rd: r"))
+    assert locations[2:5] == [lib, lib, lib]
+    assert locations[5] == Location(str(main), 2, 3, ("f",))
+    assert locations[6] == locations[7] == Location(str(main), 3, 1, ())
+
+
+def test_dump_load():
+    _, source_map = sourcemap.transpile("let m = {+ 3{[-]>}} in m >")
+    file = io.StringIO()
+    source_map.dump(file)
+    file.seek(0)
+    loaded = SourceMap.load(file)
+    assert loaded.length == source_map.length
+    for offset in range(source_map.length):
+        assert loaded.lookup(offset) == source_map.lookup(offset)
+
+
+def test_hotspots():
+    """Test if executions are summed by lines and by macros on stack."""
+    code = "let g = {+} f = {g g} in\nf\n+"
+    _, source_map = sourcemap.transpile(code)
+    lines, macros = sourcemap.hotspots(source_map, [(0, 5), (1, 3), (2, 2)])
+    assert lines == [("<code>:1", 8), ("<code>:?", 2)]
+    assert macros == [("f", 8), ("g", 8)]
+    assert sourcemap.report(lines, macros).splitlines()[1].split() == ["8", "<code>:1"]
@@ -0,0 +1,109 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rainduck.__main__ import _FLAGS, _OPTIONS, COMMANDS, _parse, main
+
+ROOT = Path(__file__).parent.parent
+IMPORT_BUDGET = 0.15  # seconds of importing rainduck for plain transpilation
+
+
+def test_parse():
+    assert _parse(["a.rd", "-O2", "--output=-"]) == {
+        "source": "a.rd",
+        "optimize": "2",
+        "output": "-",
+    }
+    assert _parse(["transpile", "--cache-dir", "c", "--no-cache", "a.rd"]) == {
+        "cache_dir": "c",
+        "no_cache": "--no-cache",
+        "source": "a.rd",
+    }
+    assert _parse(["a.rd", "--stats", "--stats-format", "json"]) == {
+        "source": "a.rd",
+        "stats": "--stats",
+        "stats_format": "json",
+    }
+    assert _parse(["a.rd", "--max-depth", "9", "--timeout=0.5"]) == {
+        "source": "a.rd",
+        "max_depth": "9",
+        "timeout": "0.5",
+    }
+    assert _parse(["a.rd", "--max-instructions", "-1"]) is None
+    assert _parse(["a.rd", "--timeout", "soon"]) is None
+    assert _parse(["a.rd", "--stats-format", "csv"]) is None
+    for args in [[], ["run", "a.rd"], ["a.rd", "b.rd"], ["a.rd", "--help"]]:
+        assert _parse(args) is None
+    assert _parse(["a.rd", "-O", "x"]) is None
+    assert _parse(["a.rd", "--output"]) is None
+
+
+def test_commands():
+    """Test if the fast path knows all commands of the typer application."""
+    import typer
+
+    from rainduck.cli import app
+
+    commands = typer.main.get_command(app).commands
+    assert set(commands) == COMMANDS | {"transpile"}
+
+
+def test_transpile_options():
+    """Test if the fast path knows options of the typer transpile command
+    under the same names, except --source-map left to typer."""
+    import typer
+
+    from rainduck.cli import app
+
+    command = typer.main.get_command(app).commands["transpile"]
+    options = {o: p.name for p in command.params for o in p.opts if o[0] == "-"}
+    del options["--source-map"]
+    flags = {flag: flag[2:].replace("-", "_") for flag in _FLAGS}
+    assert {**_OPTIONS, **flags} == options
+
+
+def test_main(tmp_path, capsys):
+    source = tmp_path / "a.rd"
+    source.write_text("let r = {>} in 2r")
+    main([str(source), "--no-cache", "--output", "-"])
+    assert capsys.readouterr().out == ">>"
+    source.write_text("-1[-]")
+    with pytest.raises(SystemExit):
+        main([str(source), "--no-cache"])
+    assert "InversionError" in capsys.readouterr().err
+    source.write_text("10{+}")
+    with pytest.raises(SystemExit):
+        main([str(source), "--no-cache", "--output", "-", "--max-instructions", "9"])
+    assert "LimitError" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main(["--help"])
+    assert "build" in capsys.readouterr().out
+
+
+def test_import_time(tmp_path):
+    """Test if plain transpilation imports neither typer nor rich and rainduck
+    modules are imported within budget."""
+    source = tmp_path / "a.rd"
+    source.write_text("+")
+    code = (
+        "import sys; from rainduck.__main__ import main;"
+        f"main([{str(source)!r}, '--no-cache']); print(*sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert (tmp_path / "a.bf").read_text() == "+"
+    modules = {m.split(".")[0] for m in result.stdout.split()}
+    assert not modules & {"typer", "rich", "click"}
+    rainduck_us = 0
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip().startswith("rainduck") and not name.startswith("  "):
+            rainduck_us += int(cumulative)
+    assert 0 < rainduck_us < IMPORT_BUDGET * 1e6
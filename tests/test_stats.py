@@ -0,0 +1,45 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from rainduck.errors import RainDuckInversionError
+from rainduck.stats import Stats
+from rainduck.transpiler import transpile, transpile_to
+
+
+def test_transpile_stats():
+    """Test if sizes of all phases are recorded and tracing is stopped."""
+    stats = Stats()
+    assert transpile("let r = {>} in 3{+r}", stats=stats) == "+>+>+>"
+    sizes = {p.name: p.count for p in stats.phases.values()}
+    assert sizes["tokenize"] == 14 and sizes["write"] == 6
+    assert sizes["parse"] > 0 and sizes["transpile"] > 0
+    assert all(p.seconds > 0 and p.peak > 0 for p in stats.phases.values())
+    assert not tracemalloc.is_tracing()
+    stats = Stats()
+    assert transpile("2{+[-]}", optimize=2, stats=stats) == "+[-]+[-]"
+    assert stats.phases["write"].count == 8
+
+
+def test_transpile_to_stats():
+    """Test if streamed code is counted once per write and failed
+    transpilation stops tracing."""
+    stats = Stats()
+    file = io.StringIO()
+    transpile_to("1000{+>}", file, buffer_size=100, stats=stats)
+    assert stats.phases["write"].count == len(file.getvalue()) == 2000
+    assert not tracemalloc.is_tracing()
+    with pytest.raises(RainDuckInversionError):
+        transpile_to("-1[-]", io.StringIO(), stats=Stats())
+    assert not tracemalloc.is_tracing()
+
+
+def test_report():
+    stats = Stats()
+    transpile("+", stats=stats)
+    phases = json.loads(stats.report("json"))
+    assert [p["name"] for p in phases] == ["tokenize", "parse", "transpile", "write"]
+    assert phases[3]["count"] == 1 and phases[3]["unit"] == "bytes"
+    assert stats.report().splitlines()[4].split()[-2:] == ["1", "bytes"]
@@ -1,6 +1,16 @@
+import sys
+
 import pytest
 
-from rainduck.transpiler import transpile
+from rainduck import code_elements
+from rainduck.code_elements import Limits
+from rainduck.errors import (
+    RainDuckImportError,
+    RainDuckInversionError,
+    RainDuckLimitError,
+    RainDuckRecursionError,
+)
+from rainduck.transpiler import parse, size, transpile, transpile_elements
 
 bf_codes = ["", "<>+-,.", "+[<>>[[-+]],]..", "[[[]]]", "."]
 
@@ -71,3 +81,196 @@ def test_macro(macros, code):
 )
 def test_transpile(rainduck, braifuck):
     assert transpile(rainduck) == braifuck
+
+
+def test_emit():
+    """Test if BrainFuck code is emitted lazily and list-returning transpile
+    gives the same code.
+    """
+    chunks = parse("let r = {>} in 2{+r} -1[-]").emit()
+    assert "".join(next(chunks) for _ in range(3)) == "+>+>"
+    with pytest.raises(RainDuckInversionError):
+        next(chunks)
+    block = parse("2{+[<[-]]} -3>")
+    assert "".join(str(x) for x in block.transpile()) == "+[<[-]]+[<[-]]<<<"
+
+
+def test_import(tmp_path):
+    """Test if imported files are parsed once and import cycles are reported."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "a.rd").write_text("let #import(lib.rd) ra = {r +} in")
+    main = tmp_path / "main.rd"
+    code = "let #import(a.rd) #import(lib.rd) in ra r"
+    assert transpile(code, main) == ">+>"
+    lib_macros = code_elements._import_cache[(tmp_path / "lib.rd").resolve()][1]
+    assert transpile(code, main) == ">+>"
+    assert code_elements._import_cache[(tmp_path / "lib.rd").resolve()][1] is lib_macros
+    (tmp_path / "lib.rd").write_text("let r = {<<} in")
+    assert transpile(code, main) == "<<+<<"
+    (tmp_path / "lib.rd").write_text("let #import(a.rd) in")
+    with pytest.raises(RainDuckImportError) as e:
+        transpile(code, main)
+    assert "a.rd -> " in e.value.message and "lib.rd -> " in e.value.message
+
+
+def test_memoized_expansion():
+    """Test if macro expansions are reused and errors keep their pointers."""
+    code_elements.clear_memo()
+    assert transpile("let r = {2>} in r -1r r") == ">><<>>"
+    codes = [code for code, _, _ in code_elements._memo.values()]
+    assert ">>" in codes and "<<" in codes
+    with pytest.raises(RainDuckInversionError) as e:
+        transpile("let e = {[-]} in e -1e")
+    assert [(p.line_pos, p.char_pos) for p in e.value.traceback] == [(1, 11), (1, 23)]
+    code = "let f(x) = {x x} c = {f(+)} d = {f(-)} in c f({d c})"
+    assert transpile(code) == "++" + 2 * "--++"
+
+
+def test_memo_is_bounded():
+    """Test if memo keeps bounded number of entries, also of empty expansions
+    of trees parsed again and again."""
+    code_elements.clear_memo()
+    for _ in range(2 * code_elements.MEMO_ENTRIES):
+        assert transpile("let e = {} in e") == ""
+    assert len(code_elements._memo) == code_elements.MEMO_ENTRIES
+    cost = code_elements.MEMO_ENTRIES * code_elements.MEMO_ENTRY_COST
+    assert code_elements._memo_size == cost
+    code_elements.clear_memo()
+
+
+def test_large_repeat_count():
+    """Test if repeated code is emitted once and equal runs share objects."""
+    code_elements.clear_memo()
+    chunks = list(parse("100000{+>[-]} 3{}").emit())
+    assert "".join(chunks) == 100000 * "+>[-]" and len(chunks) < 100
+    elements = transpile_elements("1000{+ 2{>}} 2{-[-]}")
+    assert "".join(map(str, elements)) == 1000 * "+>>" + 2 * "-[-]"
+    assert len({id(e) for e in elements if str(e) == ">>"}) == 1
+    loops = [e for e in elements if isinstance(e, code_elements.BrainFuckLoop)]
+    assert len({id(e.code[0]) for e in loops}) == 1
+
+
+def test_parsed_tree_is_read_only():
+    """Test if expansions of one parsed tree can be interleaved."""
+    code_elements.clear_memo()
+    block = parse("let f(x; y={<}) = {x y x} g(z) = {f(z) f({z z})} in g(+) g(-)")
+    chunks = list(zip(block.emit(), block.emit()))
+    assert "".join(a for a, _ in chunks) == "+<+++<++-<---<--"
+    assert "".join(b for _, b in chunks) == "+<+++<++-<---<--"
+    frame = code_elements.Frame(None, ())
+    with pytest.raises(AttributeError):
+        frame.parent = frame
+
+
+def test_deep_nesting():
+    """Test if nesting is limited only by memory, not by recursion limit, and
+    errors in deeply nested macros keep all pointers."""
+    depth = 3 * sys.getrecursionlimit()
+    loops = "[" * depth + "+" + "]" * depth
+    assert transpile(loops) == loops
+    assert transpile("+" + loops, optimize=2) == "+" + loops.replace("+", "-")
+    assert transpile("{" * depth + "+" + "}" * depth) == "+"
+    assert transpile("1 " * depth + ">") == ">"
+    code_elements.clear_memo()
+    calls = "f(" * depth + "+" + ")" * depth
+    assert transpile(f"let f(x) = {{x}} in 2{calls}") == "++"
+    macros = " ".join(f"m{i} = {{m{i - 1}}}" for i in range(1, depth))
+    with pytest.raises(RainDuckInversionError) as e:
+        transpile(f"let m0 = {{[-]}} {macros} in -1m{depth - 1}")
+    assert len(e.value.traceback) == depth + 1
+
+
+def test_limits():
+    """Test if exceeded limits abort transpilation with pointer to the
+    multiplication or macro call exceeding them, also in reused code."""
+    with pytest.raises(RainDuckLimitError) as e:
+        transpile("+\n 1000000000{+>}", limits=Limits(instructions=1000))
+    assert [(p.line_pos, p.char_pos) for p in e.value.traceback] == [(2, 2)]
+    code = "let m(x) = {x x} in m(m(m(+)))"
+    assert transpile(code, limits=Limits(instructions=8)) == 8 * "+"
+    with pytest.raises(RainDuckLimitError) as e:
+        transpile(code, limits=Limits(instructions=7), optimize=1)
+    assert e.value.traceback[0].macro_name == "m"
+    with pytest.raises(RainDuckLimitError) as e:
+        transpile("let f(x) = {+ f({x x})} in\n f(+)", limits=Limits(depth=100))
+    assert len(e.value.traceback) == 50
+    assert str(e.value).endswith("in 'f'\n(repeated 48 more times)")
+    with pytest.raises(RainDuckLimitError):
+        transpile("let f(x) = {[f(x)]} in 0{f(+)}", limits=Limits(seconds=0.01))
+    code_elements.clear_memo()
+    macros = "let a = {+} b = {>a<} c = {>b<} d = {>c<} in "
+    with pytest.raises(RainDuckLimitError):
+        transpile(macros + "{{{{{d}}}}}", limits=Limits(depth=10))
+    with pytest.raises(RainDuckLimitError):  # also when d is reused
+        transpile(macros + "d {{{{{d}}}}}", limits=Limits(depth=10))
+    assert transpile(macros + "{{{{{d}}}}}") == ">>>+<<<"  # d is memoized
+    with pytest.raises(RainDuckLimitError):
+        transpile(macros + "{{{{{d}}}}}", limits=Limits(depth=10))
+    with pytest.raises(RainDuckLimitError):
+        size(macros + "d {{{{{d}}}}}", limits=Limits(depth=10))
+    with pytest.raises(RainDuckLimitError):
+        transpile(macros + "{{d}}", limits=Limits(macro_depth=3))
+    limits = Limits(instructions=1000, depth=1000, seconds=10)
+    assert transpile("10{+ 10{-}}", limits=limits) == 10 * ("+" + 10 * "-")
+
+
+def test_infinite_recursion():
+    """Test if macro containing itself fails instead of running forever,
+    also if its arguments grow with every call."""
+    with pytest.raises(RainDuckRecursionError) as e:
+        transpile("let a = {+a} in a")
+    assert len(e.value.traceback) == 2
+    with pytest.raises(RainDuckRecursionError):
+        transpile("let a = {+ b} b = {[2{a}]} in b")
+    with pytest.raises(RainDuckLimitError) as e:
+        transpile("let f(x) = {f({x x})} in f(+)")
+    assert str(e.value).startswith(
+        f"LimitError: Macro calls are nested deeper than {code_elements.MAX_DEPTH}."
+    )
+    # only macro calls are limited by default
+    depth = code_elements.MAX_DEPTH + 10
+    loops = "+" + depth * "[" + "-" + depth * "]"
+    assert transpile(loops) == loops
+    assert size(loops) == len(loops)
+    limits = code_elements.command_limits(None, 0, 0.5)  # 0 means no limit
+    assert limits == Limits(seconds=0.5, macro_depth=None)
+    with pytest.raises(RainDuckLimitError, match="took longer"):
+        transpile("let f(x) = {f({x x})} in f(+)", limits=limits)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "",
+        "+[<>>[[-+]],]..",
+        "let m(x) = {x x} in m(m(m({+ [-]})))",
+        "3{[-]>} 0{[-]} -2{<+}",
+        "let f(x; y = {<}) = {x -2{y} x} in f(>) -1{f(+; >)}",
+    ],
+)
+def test_size(code):
+    """Test if size is length of transpiled code."""
+    assert size(code) == len(transpile(code))
+
+
+def test_size_errors():
+    """Test if sizes of huge code are computed without emitting it and errors
+    are raised as when code is emitted, also for discarded code."""
+    code = "let a = {+>} b = {a -1a a} in 1000000000{1000000000{b}}"
+    assert size(code) == 6 * 10**18
+    assert size(code, inverse=True) == 6 * 10**18
+    with pytest.raises(RainDuckInversionError) as e:
+        size("let f(x) = {x} in\n+ f([-])", inverse=True)
+    pointers = [(p.line_pos, p.char_pos) for p in e.value.traceback]
+    assert pointers == [(2, 5), (1, 14), (2, 3)]
+    for code in ["+ -1[-]", "0{-1[-]}", "0{1000000000{2{-1[-]}}}"]:
+        with pytest.raises(RainDuckInversionError):
+            size(code)
+        with pytest.raises(RainDuckInversionError):
+            transpile(code)
+    with pytest.raises(RainDuckRecursionError):
+        size("let f = {+ 2{f}} in f")
+    with pytest.raises(RainDuckRecursionError):
+        transpile("let f = {+ f} in 0{f}")
+    with pytest.raises(RainDuckLimitError):
+        size("let f(x) = {f({x x})} in f(+)", limits=Limits(depth=100))
@@ -0,0 +1,32 @@
+import os
+
+from rainduck.watch import Watcher
+
+
+def test_watcher(tmp_path):
+    """Test if only new files and files with changed inputs are transpiled."""
+    (tmp_path / "lib.rd").write_text("let r = {>} in")
+    (tmp_path / "a.rd").write_text("let #import(lib.rd) in r")
+    (tmp_path / "b.rd").write_text("+")
+    watcher = Watcher([str(tmp_path / "[ab].rd")])
+
+    def poll():
+        return [(os.path.basename(f), e is None) for f, e, _ in watcher.poll()]
+
+    assert poll() == [("a.rd", True), ("b.rd", True)]
+    assert poll() == []
+    (tmp_path / "lib.rd").write_text("let r = {>>} in")
+    assert poll() == [("a.rd", True)]
+    assert (tmp_path / "a.bf").read_text() == ">>"
+    (tmp_path / "b.rd").write_text("let #import(new.rd) in n")
+    assert poll() == [("b.rd", False)]
+    assert poll() == []
+    (tmp_path / "new.rd").write_text("let n = {-} in")
+    (tmp_path / "a.rd").write_text("let #import(lib.rd) in 2r")
+    assert poll() == [("a.rd", True), ("b.rd", True)]
+    assert (tmp_path / "b.bf").read_text() == "-"
+    (tmp_path / "b.rd").unlink()
+    (tmp_path / "c.rd").write_text("+")
+    watcher.patterns.append(str(tmp_path / "c.rd"))
+    assert poll() == [("c.rd", True)]
+    assert set(watcher.inputs) == {str(tmp_path / "a.rd"), str(tmp_path / "c.rd")}